@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 
 
 class CreatedModel(models.Model):
@@ -10,3 +10,8 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+    def save(self, *args, **kwargs):
+        # Сигналы после сохранения (счётчики, лента) идут в той же транзакции
+        with transaction.atomic():
+            super().save(*args, **kwargs)
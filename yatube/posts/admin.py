@@ -1,10 +1,98 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
 
+from . import search
 from .models import Group, Post, Comment
 
 
+class FullTextSearchMixin:
+    """Поиск по индексу FTS5 вместо LIKE '%q%' по search_fields."""
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search.match_expression(search_term):
+            return queryset, False
+        return queryset.filter(
+            pk__in=search.matching(self.search_kind, search_term)
+        ), False
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Без фильтров COUNT(*) в SQLite проходит всю таблицу, поэтому
+    число строк берём из статистики ANALYZE, а без неё - по MAX(id).
+    """
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if query.where:
+            return super().count
+        table = self.object_list.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone():
+                # Первое число в stat - строк в таблице
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                    [table]
+                )
+                row = cursor.fetchone()
+                if row:
+                    return int(row[0].split()[0])
+            cursor.execute(f'SELECT MAX(id) FROM {table}')
+            return cursor.fetchone()[0] or 0
+
+
+class InputFilter(admin.SimpleListFilter):
+    """Поле ввода вместо списка всех значений в боковой панели."""
+    template = 'admin/input_filter.html'
+
+    def lookups(self, request, model_admin):
+        # Пустой список Django не показал бы вовсе
+        return ((None, None),)
+
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        all_choice['query_parts'] = [
+            (key, value)
+            for key, value in changelist.get_filters_params().items()
+            if key != self.parameter_name
+        ]
+        yield all_choice
+
+
+class AuthorFilter(InputFilter):
+    title = 'автор'
+    parameter_name = 'author'
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(author__username=self.value())
+
+
+class PostFilter(InputFilter):
+    title = 'номер поста'
+    parameter_name = 'post'
+
+    def queryset(self, request, queryset):
+        if self.value() and self.value().isdigit():
+            return queryset.filter(post_id=self.value())
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Иначе под списком ещё один COUNT(*) по всей таблице
+    show_full_result_count = False
+
+
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(FullTextSearchMixin, ScalableAdmin):
+    search_kind = search.POST
     list_display = (
         'pk',
         'pub_date',
@@ -15,27 +103,43 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text', )
     list_filter = (
         'pub_date',
-        'author',
+        AuthorFilter,
         'group',
     )
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', )
     empty_value_display = '-пусто-'
     list_editable = ('group',)
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == 'group':
+            # Список групп один на все строки list_editable
+            if not hasattr(request, '_group_choices'):
+                request._group_choices = list(iter(field.choices))
+            field.choices = request._group_choices
+        return field
+
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FullTextSearchMixin, ScalableAdmin):
+    search_kind = search.COMMENT
     list_display = (
         'pub_date',
         'post',
         'author',
         'text',
     )
+    search_fields = ('text', )
     list_filter = (
         'pub_date',
-        'author',
-        'post',
-        'text'
+        AuthorFilter,
+        PostFilter,
     )
+    list_select_related = ('author', 'post')
+    autocomplete_fields = ('author', 'post')
 
 
-admin.site.register(Group)
+@admin.register(Group)
+class GroupAdmin(admin.ModelAdmin):
+    search_fields = ('title', )
@@ -0,0 +1,198 @@
+"""
+JSON API только для чтения, для мобильного клиента. Отдаём строки
+.values() как есть, без моделей и шаблонов; листаем курсором,
+?fields= выбирает нужные поля, ?limit= - размер страницы.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import path
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET
+
+from . import timeline
+from .models import Comment, Group, Post, User
+from .paginators import CURSOR_KEYS, CursorPaginator
+
+app_name = 'api'
+
+# Имя поля в ответе -> колонка для .values()
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+}
+GROUP_FIELDS = {
+    'id': 'id',
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+}
+GROUP_KEYS = ('slug', 'id')
+
+
+class ApiError(Exception):
+    def __init__(self, detail, status=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+def _fields(request, available):
+    fields = request.GET.get('fields')
+    if not fields:
+        return list(available)
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in available]
+    if unknown or not fields:
+        raise ApiError(
+            f'Неизвестные поля: {", ".join(unknown)}. '
+            f'Доступны: {", ".join(available)}'
+        )
+    return fields
+
+
+def _limit(request, default):
+    limit = request.GET.get('limit')
+    if limit is None:
+        return default
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    if not 1 <= limit <= settings.API_MAX_LIMIT:
+        raise ApiError(f'limit должен быть от 1 до {settings.API_MAX_LIMIT}')
+    return limit
+
+
+def _link(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+
+def _serialize(name, value):
+    if name == 'image':
+        storage = Post._meta.get_field('image').storage
+        return storage.url(value) if value else None
+    return value
+
+
+def _page(request, rows, available, keys=CURSOR_KEYS, descending=True,
+          parse_key=parse_datetime, per_page=None):
+    """Страница строк rows.values(...) с нужными полями и ссылками."""
+    fields = _fields(request, available)
+    per_page = _limit(request, per_page or settings.POSTS_PER_PAGE)
+    columns = dict.fromkeys(keys)
+    columns.update(dict.fromkeys(available[field] for field in fields))
+    paginator = CursorPaginator(
+        rows.values(*columns), per_page, keys=keys,
+        descending=descending, parse_key=parse_key
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
+    return JsonResponse({
+        'results': [
+            {
+                field: _serialize(field, row[available[field]])
+                for field in fields
+            }
+            for row in page
+        ],
+        'next': _link(request, page.next_cursor),
+        'previous': _link(request, page.previous_cursor),
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+def api_view(view):
+    """GET и ошибки API в JSON, а не HTML-страницей."""
+    @require_GET
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse(
+                {'detail': error.detail}, status=error.status,
+                json_dumps_params={'ensure_ascii': False}
+            )
+    return wrapper
+
+
+def _pk(queryset, **lookup):
+    pk = queryset.filter(**lookup).values_list('pk', flat=True).first()
+    if pk is None:
+        raise ApiError('Не найдено', status=404)
+    return pk
+
+
+@api_view
+def posts(request):
+    return _page(request, Post.objects.all(), POST_FIELDS)
+
+
+@api_view
+def group_posts(request, slug):
+    group_id = _pk(Group.objects, slug=slug)
+    return _page(
+        request, Post.objects.filter(group_id=group_id), POST_FIELDS
+    )
+
+
+@api_view
+def profile_posts(request, username):
+    author_id = _pk(User.objects, username=username)
+    return _page(
+        request, Post.objects.filter(author_id=author_id), POST_FIELDS
+    )
+
+
+@api_view
+def follow_feed(request):
+    if not request.user.is_authenticated:
+        raise ApiError('Нужна авторизация', status=401)
+    feed = timeline.Feed(request.user)
+    timeline.record_path(feed.path)
+    return _page(request, feed, POST_FIELDS)
+
+
+@api_view
+def post_comments(request, post_id):
+    post_id = _pk(Post.objects, pk=post_id)
+    return _page(
+        request, Comment.objects.filter(post_id=post_id), COMMENT_FIELDS,
+        descending=False, per_page=settings.COMMENTS_PER_PAGE
+    )
+
+
+@api_view
+def groups(request):
+    return _page(
+        request, Group.objects.all(), GROUP_FIELDS, keys=GROUP_KEYS,
+        descending=False, parse_key=str
+    )
+
+
+urlpatterns = [
+    path('posts/', posts, name='posts'),
+    path('posts/<int:post_id>/comments/', post_comments, name='comments'),
+    path('groups/', groups, name='groups'),
+    path('groups/<slug:slug>/posts/', group_posts, name='group_posts'),
+    path(
+        'profiles/<str:username>/posts/', profile_posts, name='profile_posts'
+    ),
+    path('follow/', follow_feed, name='follow'),
+]
@@ -0,0 +1,35 @@
+"""
+Фоновые задачи: то, что долго делать внутри запроса (нарезка миниатюр,
+досыпка лент), отдаём пулу процессов после коммита транзакции.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.db import transaction
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # spawn: форк процесса с открытым соединением к БД опасен
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.BACKGROUND_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+    return _executor
+
+
+def submit(func, *args):
+    """
+    Выполняем func(*args) в пуле после коммита: задача читает то, что
+    записал запрос. func должна быть функцией модуля (её пиклят).
+    """
+    if not settings.BACKGROUND_WORKERS:
+        func(*args)
+        return
+    transaction.on_commit(lambda: _get_executor().submit(func, *args))
@@ -0,0 +1,207 @@
+"""
+Нагрузочный замер страниц постов на больших данных: засеваем базу
+фабриками mixer/Faker, гоняем каждую страницу тестовым клиентом и
+считаем перцентили времени, число запросов и пик памяти.
+"""
+import math
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+from itertools import islice
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import Mixer
+
+from . import bulk
+from .models import Comment, Follow, Group, Post, User
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+SEED = 2022
+POSTS_PER_USER = 50
+FOLLOWS_PER_USER = 20
+COMMENTS_PER_POST = 0.5
+GROUPS = 20
+TEXTS = 1000
+PERIOD = timedelta(days=365)
+PERCENTILES = (50, 95, 99)
+
+
+def _batches(objects, size=bulk.BATCH_SIZE):
+    objects = iter(objects)
+    batch = list(islice(objects, size))
+    while batch:
+        yield batch
+        batch = list(islice(objects, size))
+
+
+def _bulk_create(model, objects):
+    for batch in _batches(objects):
+        with transaction.atomic():
+            if model in (Post, Comment, Follow):
+                with bulk.keep_pub_date(model):
+                    model.objects.bulk_create(batch, ignore_conflicts=True)
+            else:
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def seed(posts, seed=SEED, log=lambda message: None):
+    """
+    Засеваем posts постов и пропорционально авторов, групп, подписок
+    и комментариев. При одинаковом seed данные одинаковые.
+    """
+    rng = random.Random(seed)
+    random.seed(seed)
+    Faker.seed(seed)
+    mixer = Mixer(commit=False)
+    fake = Faker('ru_RU')
+    now = timezone.now()
+
+    def pub_date():
+        return now - PERIOD * rng.random()
+
+    users = max(posts // POSTS_PER_USER, 2)
+    log(f'Пользователей: {users}')
+
+    def make_user(number):
+        user = mixer.blend(User, username=f'bench{number}')
+        user.set_unusable_password()
+        return user
+
+    _bulk_create(User, (make_user(number) for number in range(users)))
+    user_ids = list(User.objects.filter(
+        username__startswith='bench'
+    ).values_list('pk', flat=True))
+
+    _bulk_create(Group, (
+        mixer.blend(Group, slug=f'bench-{number}') for number in range(GROUPS)
+    ))
+    group_ids = list(Group.objects.filter(
+        slug__startswith='bench-'
+    ).values_list('pk', flat=True))
+
+    log(f'Постов: {posts}')
+    texts = [fake.paragraph(nb_sentences=5) for _ in range(TEXTS)]
+    _bulk_create(Post, (
+        Post(
+            author_id=rng.choice(user_ids),
+            group_id=rng.choice(group_ids) if rng.random() < 0.5 else None,
+            text=rng.choice(texts),
+            pub_date=pub_date(),
+        )
+        for _ in range(posts)
+    ))
+    first, last = Post.objects.aggregate(
+        Min('pk'), Max('pk')
+    ).values()
+
+    comments = int(posts * COMMENTS_PER_POST)
+    log(f'Комментариев: {comments}')
+    _bulk_create(Comment, (
+        Comment(
+            post_id=rng.randint(first, last),
+            author_id=rng.choice(user_ids),
+            text=rng.choice(texts),
+            pub_date=pub_date(),
+        )
+        for _ in range(comments)
+    ))
+
+    log('Подписки')
+    _bulk_create(Follow, (
+        Follow(user_id=user_id, author_id=author_id, pub_date=pub_date())
+        for user_id in user_ids
+        for author_id in set(rng.sample(
+            user_ids, min(FOLLOWS_PER_USER, len(user_ids))
+        )) - {user_id}
+    ))
+
+    log('Счётчики, ленты и поисковый индекс')
+    bulk.rebuild_derived()
+
+
+def cases(rng):
+    """Страницы для замера: имя -> функция, дающая следующий URL."""
+    group_slugs = list(Group.objects.values_list('slug', flat=True))
+    usernames = list(User.objects.filter(
+        stats__posts_count__gt=0
+    ).values_list('username', flat=True)[:1000])
+    first, last = Post.objects.aggregate(Min('pk'), Max('pk')).values()
+    return {
+        'index': lambda: reverse('posts:index'),
+        'index_deep': lambda: reverse('posts:index') + '?page=100',
+        'group_posts': lambda: reverse(
+            'posts:group_list', args=(rng.choice(group_slugs),)
+        ),
+        'profile': lambda: reverse(
+            'posts:profile', args=(rng.choice(usernames),)
+        ),
+        'post_detail': lambda: reverse(
+            'posts:post_detail', args=(rng.randint(first, last),)
+        ),
+        'follow_index': lambda: reverse('posts:follow_index'),
+    }
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(len(ordered) * percent / 100) - 1, 0)]
+
+
+def _request(client, url, warm):
+    if not warm:
+        cache.clear()
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = client.get(url)
+        elapsed = time.perf_counter() - started
+    return response.status_code, elapsed, len(queries)
+
+
+def measure(repeat, warm=False, seed=SEED, names=None):
+    """
+    Замер каждой страницы repeat раз. Без warm перед каждым
+    запросом чистим кэш, то есть меряем полную сборку страницы.
+    """
+    rng = random.Random(seed)
+    client = Client()
+    reader = User.objects.filter(follower__isnull=False).first()
+    if reader is not None:
+        client.force_login(reader)
+    results = {}
+    for name, next_url in cases(rng).items():
+        if names and name not in names:
+            continue
+        _request(client, next_url(), warm)
+        timings, query_counts, statuses = [], [], set()
+        for _ in range(repeat):
+            status, elapsed, queries = _request(client, next_url(), warm)
+            timings.append(elapsed * 1000)
+            query_counts.append(queries)
+            statuses.add(status)
+        # Память отдельно: tracemalloc сам замедляет запросы
+        tracemalloc.start()
+        _request(client, next_url(), warm)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = {
+            **{
+                f'p{percent}_ms': round(percentile(timings, percent), 3)
+                for percent in PERCENTILES
+            },
+            'mean_ms': round(statistics.mean(timings), 3),
+            'queries_max': max(query_counts),
+            'queries_median': statistics.median(query_counts),
+            'peak_memory_kb': round(peak / 1024, 1),
+            'statuses': sorted(statuses),
+        }
+    return results
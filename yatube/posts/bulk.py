@@ -0,0 +1,274 @@
+"""
+Выгрузка и загрузка групп, постов, комментариев и подписок в JSONL:
+строка - один объект с полем model. Читаем и пишем потоком, пачками,
+так что память не зависит от объёма данных. id из выгрузки при загрузке
+не используем: в чужой базе они заняты другими объектами. Посты ищем
+по автору и дате, комментарии - по посту, автору и дате.
+"""
+import datetime
+import json
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from . import counters, search, timeline
+from .models import Comment, Follow, Group, Post, User
+
+BATCH_SIZE = 1000
+# Порядок важен: при загрузке ссылки должны указывать на уже загруженное
+MODELS = ('group', 'post', 'comment', 'follow')
+
+EXPORTS = {
+    'group': (Group, ('slug', 'title', 'description'), {}),
+    'post': (
+        Post,
+        ('id', 'author__username', 'group__slug', 'text', 'pub_date',
+         'image'),
+        {'author__username': 'author', 'group__slug': 'group'},
+    ),
+    'comment': (
+        Comment,
+        ('id', 'post_id', 'post__author__username', 'post__pub_date',
+         'author__username', 'text', 'pub_date'),
+        {'post_id': 'post', 'post__author__username': 'post_author',
+         'post__pub_date': 'post_pub_date', 'author__username': 'author'},
+    ),
+    'follow': (
+        Follow,
+        ('user__username', 'author__username', 'pub_date'),
+        {'user__username': 'user', 'author__username': 'author'},
+    ),
+}
+
+
+class _Encoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder режет даты до миллисекунд, а нам нужны все."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def lines(name, queryset=None):
+    """Строки JSONL модели; queryset позволяет выгрузить часть."""
+    model, fields, renames = EXPORTS[name]
+    if queryset is None:
+        queryset = model.objects.all()
+    rows = queryset.order_by('pk').values_list(*fields)
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        record = {'model': name}
+        record.update(
+            (renames.get(field, field), value)
+            for field, value in zip(fields, row)
+        )
+        yield json.dumps(record, cls=_Encoder, ensure_ascii=False) + '\n'
+
+
+def dump(stream, models=MODELS):
+    """Пишем модели в stream, после каждой отдаём (модель, строк)."""
+    for name in models:
+        count = 0
+        for line in lines(name):
+            stream.write(line)
+            count += 1
+        yield name, count
+
+
+def _user_ids(usernames):
+    """Незнакомых авторов заводим без пароля: войти смогут через сброс."""
+    usernames = set(usernames)
+    found = dict(User.objects.filter(
+        username__in=usernames
+    ).values_list('username', 'id'))
+    missing = usernames - found.keys()
+    if missing:
+        users = [User(username=username) for username in missing]
+        for user in users:
+            user.set_unusable_password()
+        User.objects.bulk_create(users, ignore_conflicts=True)
+        found.update(User.objects.filter(
+            username__in=missing
+        ).values_list('username', 'id'))
+    return found
+
+
+def _groups(records):
+    existing = set(Group.objects.filter(
+        slug__in={record['slug'] for record in records}
+    ).values_list('slug', flat=True))
+    groups = {}
+    for record in records:
+        if record['slug'] not in existing:
+            groups[record['slug']] = Group(
+                slug=record['slug'],
+                title=record['title'],
+                description=record['description'],
+            )
+    return list(groups.values())
+
+
+def _post_ids(keys):
+    """(автор, дата) -> id уже загруженных постов."""
+    keys = set(keys)
+    posts = Post.objects.filter(
+        author__username__in={username for username, _ in keys},
+        pub_date__in={pub_date for _, pub_date in keys},
+    ).values_list('author__username', 'pub_date', 'id')
+    return {
+        (username, pub_date): pk for username, pub_date, pk in posts
+        if (username, pub_date) in keys
+    }
+
+
+def _posts(records):
+    for record in records:
+        record['pub_date'] = parse_datetime(record['pub_date'])
+    users = _user_ids(record['author'] for record in records)
+    groups = dict(Group.objects.filter(
+        slug__in={record['group'] for record in records}
+    ).values_list('slug', 'id'))
+    existing = _post_ids(
+        (record['author'], record['pub_date']) for record in records
+    )
+    posts = {}
+    for record in records:
+        key = record['author'], record['pub_date']
+        if key not in existing:
+            posts[key] = Post(
+                author_id=users[record['author']],
+                group_id=groups.get(record['group']),
+                text=record['text'],
+                pub_date=record['pub_date'],
+                image=record['image'] or '',
+            )
+    return list(posts.values())
+
+
+def _comments(records):
+    for record in records:
+        record['pub_date'] = parse_datetime(record['pub_date'])
+        record['post_pub_date'] = parse_datetime(record['post_pub_date'])
+    posts = _post_ids(
+        (record['post_author'], record['post_pub_date'])
+        for record in records
+    )
+    records = [
+        record for record in records
+        if (record['post_author'], record['post_pub_date']) in posts
+    ]
+    users = _user_ids(record['author'] for record in records)
+    existing = set(Comment.objects.filter(
+        post_id__in=posts.values(),
+        pub_date__in={record['pub_date'] for record in records},
+    ).values_list('post_id', 'author_id', 'pub_date'))
+    comments = {}
+    for record in records:
+        key = (
+            posts[record['post_author'], record['post_pub_date']],
+            users[record['author']],
+            record['pub_date'],
+        )
+        if key not in existing:
+            post_id, author_id, pub_date = key
+            comments[key] = Comment(
+                post_id=post_id,
+                author_id=author_id,
+                text=record['text'],
+                pub_date=pub_date,
+            )
+    return list(comments.values())
+
+
+def _follows(records):
+    users = _user_ids(
+        username for record in records
+        for username in (record['user'], record['author'])
+    )
+    existing = set(Follow.objects.filter(
+        user_id__in={users[record['user']] for record in records}
+    ).values_list('user_id', 'author_id'))
+    follows = {}
+    for record in records:
+        key = users[record['user']], users[record['author']]
+        if record['user'] != record['author'] and key not in existing:
+            follows[key] = Follow(
+                user_id=key[0],
+                author_id=key[1],
+                pub_date=parse_datetime(record['pub_date']),
+            )
+    return list(follows.values())
+
+
+BUILDERS = {
+    'group': (Group, _groups),
+    'post': (Post, _posts),
+    'comment': (Comment, _comments),
+    'follow': (Follow, _follows),
+}
+
+
+def _records(lines):
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+@contextmanager
+def keep_pub_date(model):
+    """Иначе bulk_create проставит всем объектам текущую дату."""
+    field = model._meta.get_field('pub_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def _save(name, records):
+    """
+    Сохраняем только объекты, которых ещё нет; id проставит база.
+    Если параллельно кто-то вставил то же самое, пачка откатится
+    с IntegrityError, а не сольётся с чужими данными.
+    """
+    model, build = BUILDERS[name]
+    with transaction.atomic():
+        objects = build(records)
+        if name == 'group':
+            model.objects.bulk_create(objects)
+        else:
+            with keep_pub_date(model):
+                model.objects.bulk_create(objects)
+    return len(objects)
+
+
+def load(lines, batch_size=BATCH_SIZE):
+    """
+    Загружаем строки пачками, каждую в своей транзакции. Уже
+    существующие объекты пропускаем, так что загрузку можно повторить.
+    После каждой пачки отдаём (модель, прочитано, вставлено).
+    """
+    records = _records(lines)
+    batch = list(islice(records, batch_size))
+    while batch:
+        name = batch[0]['model']
+        same = 0
+        while same < len(batch) and batch[same]['model'] == name:
+            same += 1
+        chunk, batch = batch[:same], batch[same:]
+        yield name, len(chunk), _save(name, chunk)
+        batch.extend(islice(records, batch_size - len(batch)))
+
+
+def rebuild_derived():
+    """bulk_create обходит сигналы: пересчитываем всё, что они ведут."""
+    counters.reconcile()
+    timeline.rebuild()
+    search.rebuild()
+    # Кэш общий для всех процессов: сбрасываем страницы и версии разом
+    cache.clear()
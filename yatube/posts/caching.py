@@ -0,0 +1,124 @@
+"""
+Кэш страниц с версионными ключами. Сигналы поднимают версию области
+(весь сайт, группа, автор, пост), и старые страницы просто перестают
+находиться в кэше, поэтому их можно хранить часами. Кэш общий для
+всех процессов, иначе версию поднимал бы только тот, кто принял запись.
+"""
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control
+from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition
+
+
+def _version_key(scope):
+    return f'version:{scope}'
+
+
+def _fresh_version():
+    # Версия из времени не повторит вытесненную из кэша.
+    return int(time.time() * 1000)
+
+
+def _versions(scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _fresh_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def get_versions(scopes):
+    return '.'.join(str(version) for version in _versions(scopes))
+
+
+def stamp_versions(posts):
+    """
+    post.card_version для кэша карточек: версия карточки поста, групп
+    (в карточке есть название группы) и автора (его имя). Комментарии
+    карточку не меняют, поэтому версия не post:{pk}. Одно чтение кэша
+    на страницу.
+    """
+    posts = list(posts)
+    scopes = ['groups']
+    for post in posts:
+        scopes += [f'card:{post.pk}', f'user:{post.author_id}']
+    groups, *versions = _versions(scopes)
+    for post, card, author in zip(posts, versions[::2], versions[1::2]):
+        post.card_version = f'{card}.{groups}.{author}'
+    return posts
+
+
+def bump(*scopes):
+    # Не incr: у файлового кэша он перезаписывает ключ со сроком
+    # по умолчанию. Новая версия больше старой и не старше часов.
+    keys = [_version_key(scope) for scope in scopes]
+    current = cache.get_many(keys)
+    cache.set_many({
+        key: max(current.get(key, 0) + 1, _fresh_version()) for key in keys
+    }, timeout=None)
+
+
+def cache_versioned(scopes):
+    """
+    Как cache_page, только префикс ключа собран из версий областей,
+    которые возвращает scopes(**kwargs) для этой страницы. Кэшируем
+    только страницы для гостей: у вошедшего в них своя шапка, кнопки
+    и CSRF-токен, а cache_page внутри вида не видит Vary: Cookie.
+    Им страницу собирают из кэша карточек.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.user.is_authenticated:
+                response = view(request, *args, **kwargs)
+                patch_cache_control(response, private=True)
+            else:
+                prefix = f'{view.__name__}:{get_versions(scopes(**kwargs))}'
+                response = cache_page(
+                    settings.PAGE_CACHE_TIMEOUT, key_prefix=prefix
+                )(view)(request, *args, **kwargs)
+            # Долго храним страницу мы, а браузер пусть перепроверяет.
+            patch_cache_control(response, max_age=0)
+            if response.has_header('Expires'):
+                del response['Expires']
+            return response
+        return wrapper
+    return decorator
+
+
+def newest_pub_date(queryset):
+    return queryset.order_by('-pub_date').values_list(
+        'pub_date', flat=True
+    ).first()
+
+
+def conditional(scopes, newest, per_user=False):
+    """
+    ETag из версий областей и Last-Modified из даты самой свежей записи
+    (newest(**kwargs), запрос по индексу). Дату кладём в кэш под теми
+    же версиями, так что 304 обходится одними чтениями кэша.
+    Страницы с шапкой и кнопками per_user=True: в ETag входит читатель.
+    """
+    def etag(request, *args, **kwargs):
+        versions = get_versions(scopes(**kwargs))
+        if per_user:
+            return f'{versions}-{request.user.pk or 0}'
+        return versions
+
+    def last_modified(request, *args, **kwargs):
+        names = scopes(**kwargs)
+        key = f'newest:{"|".join(names)}:{get_versions(names)}'
+        cached = cache.get(key)
+        if cached is None:
+            # Кортеж, чтобы отличить пустую ленту от промаха
+            cached = (newest(**kwargs),)
+            cache.set(key, cached, settings.PAGE_CACHE_TIMEOUT)
+        return cached[0]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
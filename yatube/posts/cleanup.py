@@ -0,0 +1,128 @@
+"""
+Уборка картинок постов: сразу при удалении и замене, а что упустили
+(падение процесса, старые файлы) - командой collect_media по частям.
+"""
+import logging
+from datetime import timedelta
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+IMAGES_DIR = Post._meta.get_field('image').upload_to.rstrip('/')
+
+
+def _storage():
+    return Post._meta.get_field('image').storage
+
+
+def remove(name):
+    """Удаляем оригинал вместе с миниатюрами и записями kvstore."""
+    storage = _storage()
+    # Старые миниатюры резались ещё от default_storage
+    for source_storage in (storage, default_storage):
+        default.kvstore.delete(ImageFile(name, source_storage))
+    storage.delete(name)
+
+
+def release(name):
+    """Оригинал общий для одинаковых загрузок: удаляем последний."""
+    if not name or Post.objects.filter(image=name).exists():
+        return
+    try:
+        remove(name)
+    except SuspiciousFileOperation:
+        # Путь вне MEDIA_ROOT: такой файл не наш, не трогаем
+        logger.warning('Не удаляем картинку вне хранилища: %s', name)
+
+
+def release_on_commit(name):
+    if name:
+        transaction.on_commit(lambda: release(name))
+
+
+def units():
+    """
+    Папки, которые обходит сборщик, по алфавиту: по имени папки
+    и продолжаем прерванный обход.
+    """
+    found = []
+    storage = _storage()
+    if storage.exists(IMAGES_DIR):
+        found.append(IMAGES_DIR)
+        found.extend(
+            f'{IMAGES_DIR}/{directory}'
+            for directory in storage.listdir(IMAGES_DIR)[0]
+        )
+    prefix = sorl_settings.THUMBNAIL_PREFIX.rstrip('/')
+    if default.storage.exists(prefix):
+        for first in default.storage.listdir(prefix)[0]:
+            found.extend(
+                f'{prefix}/{first}/{second}'
+                for second in default.storage.listdir(f'{prefix}/{first}')[0]
+            )
+    return sorted(found)
+
+
+def _old_files(storage, directory, min_age):
+    # Свежий файл может ждать коммита своего поста
+    border = timezone.now() - timedelta(seconds=min_age)
+    _, files = storage.listdir(directory)
+    for filename in files:
+        name = f'{directory}/{filename}'
+        if storage.get_modified_time(name) < border:
+            yield name
+
+
+def collect(directory, min_age):
+    """Убираем сирот одной папки, возвращаем число удалённых файлов."""
+    if directory.startswith(IMAGES_DIR):
+        names = set(_old_files(_storage(), directory, min_age))
+        referenced = set(Post.objects.filter(
+            image__in=names
+        ).values_list('image', flat=True))
+        orphans = names - referenced
+        for name in orphans:
+            remove(name)
+        return len(orphans)
+    thumbnails = {
+        add_prefix(ImageFile(name, default.storage).key): name
+        for name in _old_files(default.storage, directory, min_age)
+    }
+    registered = set(KVStore.objects.filter(
+        key__in=thumbnails
+    ).values_list('key', flat=True))
+    orphans = [
+        name for key, name in thumbnails.items() if key not in registered
+    ]
+    for name in orphans:
+        default.storage.delete(name)
+    return len(orphans)
+
+
+def collect_batch(start_after=None, limit=None, min_age=3600):
+    """
+    Обходим не больше limit папок после start_after. Возвращаем число
+    удалённых файлов и папку, с которой продолжать (None - обход закончен).
+    """
+    removed = processed = 0
+    last = None
+    for directory in units():
+        if start_after is not None and directory <= start_after:
+            continue
+        if limit is not None and processed >= limit:
+            return removed, last
+        removed += collect(directory, min_age)
+        processed += 1
+        last = directory
+    return removed, None
@@ -0,0 +1,86 @@
+"""Денормализованные счётчики постов, комментариев и подписок."""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def _shifted(field, delta):
+    # Счётчик мог разойтись с таблицей (bulk_create обходит сигналы),
+    # а ниже нуля положительное поле не опустит CHECK - удаление упадёт
+    return Greatest(F(field) + delta, 0)
+
+
+def _add(user_id, field, delta):
+    """
+    Строку счётчиков создаём только при увеличении: при каскадном
+    удалении пользователя новая строка сослалась бы на удалённого.
+    """
+    stats = UserStats.objects.filter(user_id=user_id)
+    if stats.update(**{field: _shifted(field, delta)}) or delta < 0:
+        return
+    UserStats.objects.get_or_create(user_id=user_id)
+    stats.update(**{field: _shifted(field, delta)})
+
+
+def post_added(post, delta=1):
+    _add(post.author_id, 'posts_count', delta)
+
+
+def comment_added(comment, delta=1):
+    Post.objects.filter(pk=comment.post_id).update(
+        comments_count=_shifted('comments_count', delta)
+    )
+
+
+def follow_added(follow, delta=1):
+    _add(follow.author_id, 'followers_count', delta)
+    _add(follow.user_id, 'following_count', delta)
+
+
+def followers_count(author_id):
+    return UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True
+    ).first() or 0
+
+
+def _real_count(model, field, outer):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef(outer)}).order_by().values(
+            field
+        ).annotate(total=Count('*')).values('total')
+    ), 0)
+
+
+def reconcile():
+    """Пересчитываем счётчики по таблицам, возвращаем число исправленных."""
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in User.objects.filter(
+            stats__isnull=True
+        ).values_list('pk', flat=True)),
+        ignore_conflicts=True,
+    )
+    user_counts = {
+        'posts_count': _real_count(Post, 'author', 'user_id'),
+        'followers_count': _real_count(Follow, 'author', 'user_id'),
+        'following_count': _real_count(Follow, 'user', 'user_id'),
+    }
+    stale_stats = UserStats.objects.annotate(
+        **{f'real_{field}': count for field, count in user_counts.items()}
+    ).exclude(
+        **{field: F(f'real_{field}') for field in user_counts}
+    ).values('pk')
+    fixed_stats = UserStats.objects.filter(pk__in=stale_stats).update(
+        **user_counts
+    )
+
+    comments_count = _real_count(Comment, 'post', 'pk')
+    stale_posts = Post.objects.annotate(
+        real_comments_count=comments_count
+    ).exclude(
+        comments_count=F('real_comments_count')
+    ).values('pk')
+    fixed_posts = Post.objects.filter(pk__in=stale_posts).update(
+        comments_count=comments_count
+    )
+    return fixed_stats, fixed_posts
@@ -0,0 +1,91 @@
+"""
+Выгрузка данных пользователя: его посты, комментарии и картинки.
+Архив собирается по ходу отдачи ответа, в памяти лежит только
+текущий кусок, так что размер архива на воркер не влияет.
+"""
+import posixpath
+import time
+import zipfile
+
+from django.core.exceptions import SuspiciousFileOperation
+
+from . import bulk
+from .models import Comment, Post
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _querysets(user):
+    return (
+        ('posts', 'post', Post.objects.filter(author=user)),
+        ('comments', 'comment', Comment.objects.filter(author=user)),
+    )
+
+
+def ndjson(user):
+    """Только записи: картинки в NDJSON не положить, они есть в ZIP."""
+    for _, name, queryset in _querysets(user):
+        for line in bulk.lines(name, queryset):
+            yield line.encode()
+
+
+class _Pipe:
+    """
+    Файл для ZipFile, который ничего не хранит: записанное забираем
+    через drain(). Без tell() и seek() ZipFile пишет размеры после данных.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        return data
+
+
+def _images(user):
+    storage = Post._meta.get_field('image').storage
+    names = Post.objects.filter(author=user).exclude(image='').values_list(
+        'image', flat=True
+    ).distinct().order_by('image')
+    for name in names.iterator(chunk_size=bulk.BATCH_SIZE):
+        try:
+            source = storage.open(name)
+        except (OSError, SuspiciousFileOperation):
+            # Файл потерян или лежит вне media - выгружаем что есть
+            continue
+        yield name, source
+
+
+def zip_archive(user):
+    pipe = _Pipe()
+    with zipfile.ZipFile(pipe, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for filename, name, queryset in _querysets(user):
+            with archive.open(f'{filename}.ndjson', 'w',
+                              force_zip64=True) as entry:
+                for line in bulk.lines(name, queryset):
+                    entry.write(line.encode())
+                    if pipe.size >= CHUNK_SIZE:
+                        yield pipe.drain()
+        for name, source in _images(user):
+            # Картинки уже сжаты, второй раз не жмём
+            info = zipfile.ZipInfo(
+                posixpath.join('images', name), time.localtime()[:6]
+            )
+            info.compress_type = zipfile.ZIP_STORED
+            with source, archive.open(info, 'w', force_zip64=True) as entry:
+                for chunk in source.chunks(CHUNK_SIZE):
+                    entry.write(chunk)
+                    yield pipe.drain()
+    yield pipe.drain()
@@ -0,0 +1,116 @@
+"""
+RSS и Atom для общей ленты, групп и авторов. Агрегаторы опрашивают их
+часто, поэтому перед лентой стоит conditional: без новых постов ответ
+обходится одним запросом по индексу и 304.
+"""
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+
+from .caching import conditional, newest_pub_date
+from .models import Group, Post, User
+
+
+class PostsFeed(Feed):
+    """Общая разметка записей; items() задаёт каждая лента."""
+
+    def latest(self, posts):
+        return posts.select_related('author', 'group')[:settings.FEED_ITEMS]
+
+    def item_title(self, post):
+        return Truncator(post.text).words(8)
+
+    def item_description(self, post):
+        return post.text
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', args=(post.pk,))
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_categories(self, post):
+        return (post.group.title,) if post.group else ()
+
+
+class LatestPostsFeed(PostsFeed):
+    title = 'Yatube: последние посты'
+    description = 'Новые посты всех авторов'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def items(self):
+        return self.latest(Post.objects.all())
+
+
+class GroupPostsFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_list', args=(group.slug,))
+
+    def items(self, group):
+        return self.latest(group.posts.all())
+
+
+class AuthorPostsFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def description(self, author):
+        return f'Посты пользователя {author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=(author.username,))
+
+    def items(self, author):
+        return self.latest(author.posts.all())
+
+
+def _atom(feed_class):
+    return type(
+        f'Atom{feed_class.__name__}', (feed_class,),
+        {'feed_type': Atom1Feed, 'subtitle': feed_class.description},
+    )
+
+
+def _feeds(feed_class, scopes, newest):
+    """RSS и Atom с одинаковыми валидаторами."""
+    decorator = conditional(scopes, newest)
+    return decorator(feed_class()), decorator(_atom(feed_class)())
+
+
+latest_rss, latest_atom = _feeds(
+    LatestPostsFeed,
+    lambda: ('posts',),
+    lambda: newest_pub_date(Post.objects.all()),
+)
+group_rss, group_atom = _feeds(
+    GroupPostsFeed,
+    lambda slug: (f'group:{slug}',),
+    lambda slug: newest_pub_date(Post.objects.filter(group__slug=slug)),
+)
+author_rss, author_atom = _feeds(
+    AuthorPostsFeed,
+    lambda username: (f'author:{username}',),
+    lambda username: newest_pub_date(
+        Post.objects.filter(author__username=username)
+    ),
+)
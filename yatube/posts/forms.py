@@ -1,5 +1,8 @@
 from django import forms
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
 
+from . import images
 from .models import Post, Comment
 
 
@@ -8,6 +11,29 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        """
+        Размеры берём из заголовка, который уже прочитало поле:
+        картинку-бомбу отклоняем до декодирования пикселей.
+        """
+        image = self.cleaned_data['image']
+        if not image or 'image' not in self.changed_data:
+            return image
+        if image.size > settings.POST_IMAGE_MAX_BYTES:
+            raise forms.ValidationError(
+                'Файл больше %(limit)s.',
+                params={
+                    'limit': filesizeformat(settings.POST_IMAGE_MAX_BYTES)
+                },
+            )
+        width, height = image.image.size
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise forms.ValidationError(
+                'Картинка больше %(limit)s мегапикселей.',
+                params={'limit': settings.POST_IMAGE_MAX_PIXELS // 10 ** 6},
+            )
+        return images.normalize(image)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
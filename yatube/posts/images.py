@@ -0,0 +1,52 @@
+"""Подготовка загруженной картинки поста к хранению."""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from PIL import Image, ImageOps
+
+# Метаданные, которые не нужны для показа, а EXIF ещё и выдаёт
+# геолокацию автора
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment')
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90},
+    'WEBP': {'quality': 90},
+    'PNG': {'optimize': True},
+}
+
+
+def _has_metadata(image):
+    return any(key in image.info for key in METADATA_KEYS)
+
+
+def normalize(upload):
+    """
+    Уменьшаем слишком большой оригинал и вырезаем метаданные.
+    Остальные файлы отдаём как есть, без перекодирования.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        if getattr(image, 'is_animated', False):
+            return upload
+        max_side = settings.POST_IMAGE_MAX_SIDE
+        if max(image.size) <= max_side and not _has_metadata(image):
+            upload.seek(0)
+            return upload
+        image_format = 'JPEG' if image.format == 'MPO' else image.format
+        icc_profile = image.info.get('icc_profile')
+        # Сначала уменьшаем на месте: JPEG декодируется сразу
+        # в уменьшенном масштабе, остальные - один раз целиком.
+        # exif_transpose возвращает копию (in_place в Pillow 8.3 нет),
+        # поэтому поворачиваем уже маленькую; рамка квадратная,
+        # и от поворота размер не зависит.
+        image.thumbnail((max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        options = dict(SAVE_OPTIONS.get(image_format, {}))
+        if icc_profile:
+            options['icc_profile'] = icc_profile
+        output = BytesIO()
+        image.save(output, image_format, **options)
+    return InMemoryUploadedFile(
+        output, upload.field_name, upload.name, upload.content_type,
+        output.tell(), upload.charset,
+    )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок по таблице Follow'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Читатели, чьи ленты пересобрать (по умолчанию все)'
+        )
+
+    def handle(self, *args, **options):
+        users = None
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+        count = timeline.rebuild(users)
+        self.stdout.write(self.style.SUCCESS(
+            f'Лента пересобрана, подписок обработано: {count}'
+        ))
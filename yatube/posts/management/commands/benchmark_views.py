@@ -0,0 +1,137 @@
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings, setup_test_environment, teardown_test_environment
+)
+from django.utils import timezone
+
+from posts import benchmark
+from posts.models import Post
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'),
+            capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Засевает отдельную базу на 10k/100k/1M постов и меряет страницы '
+        'постов: p50/p95/p99, число запросов, пик памяти. Пишет JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', choices=benchmark.SCALES, default='10k',
+            help='Сколько постов засеять'
+        )
+        parser.add_argument(
+            '--posts', type=int,
+            help='Точное число постов вместо --scale'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='Запросов на каждую страницу'
+        )
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='Не чистить кэш между запросами'
+        )
+        parser.add_argument(
+            '--views', nargs='+',
+            help='Мерить только эти страницы'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=benchmark.SEED,
+            help='Зерно генератора данных и выбора страниц'
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Оставить засеянную базу и взять её при следующем запуске'
+        )
+        parser.add_argument(
+            '-o', '--output', default='-',
+            help='Файл для JSON с результатами (по умолчанию stdout)'
+        )
+
+    def handle(self, *args, **options):
+        posts = options['posts'] or benchmark.SCALES[options['scale']]
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть больше нуля')
+        # Отдельная файловая база на каждый размер: рабочую не трогаем,
+        # а с --keepdb засеянные данные переживают запуск
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            settings.BASE_DIR, f'benchmark_{posts}.sqlite3'
+        )
+        # Кэш общий с сайтом: страницы засеянной базы легли бы
+        # под те же версии, так что у замера свой
+        cache_dir = os.path.join(settings.BASE_DIR, f'benchmark_{posts}_cache')
+        caches = {'default': {
+            **settings.CACHES['default'], 'LOCATION': cache_dir
+        }}
+        setup_test_environment(debug=False)
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb']
+        )
+        try:
+            with override_settings(CACHES=caches):
+                cache.clear()
+                report = self._run(posts, options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb']
+            )
+            teardown_test_environment()
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        output = json.dumps(report, ensure_ascii=False, indent=2) + '\n'
+        if options['output'] == '-':
+            self.stdout.write(output, ending='')
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                stream.write(output)
+            self.stderr.write(f'Результаты: {options["output"]}')
+
+    def _log(self, message):
+        self.stderr.write(message)
+
+    def _run(self, posts, options):
+        seeded = 0
+        if Post.objects.count() != posts:
+            started = time.monotonic()
+            benchmark.seed(posts, options['seed'], log=self._log)
+            seeded = round(time.monotonic() - started, 1)
+        self._log('Замер')
+        return {
+            'commit': _commit(),
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'posts': posts,
+            'seed': options['seed'],
+            'repeat': options['repeat'],
+            'warm': options['warm'],
+            'seed_seconds': seeded,
+            'argv': sys.argv[1:],
+            'results': benchmark.measure(
+                options['repeat'], options['warm'], options['seed'],
+                options['views']
+            ),
+        }
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from posts import cleanup
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки, на которые не ссылается ни один пост, '
+        'и миниатюры, которых нет в kvstore. Обходит папки частями'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start-after', metavar='DIR',
+            help='Продолжить обход после этой папки'
+        )
+        parser.add_argument(
+            '--limit', type=int,
+            help='Сколько папок обойти за запуск (по умолчанию все)'
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='Не трогать файлы моложе стольких секунд'
+        )
+
+    def handle(self, *args, **options):
+        removed, last = cleanup.collect_batch(
+            options['start_after'], options['limit'], options['min_age']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Удалено файлов: {removed}'))
+        if last is not None:
+            self.stdout.write(f'Продолжить: --start-after {last}')
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+
+from posts import cleanup, thumbnails
+from posts.models import Post
+from posts.storage import is_hashed
+
+
+class Command(BaseCommand):
+    help = (
+        'Переименовывает картинки постов по хешу содержимого, '
+        'склеивая одинаковые, и удаляет старые файлы с миниатюрами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, ничего не меняя'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        storage = Post._meta.get_field('image').storage
+        renamed = {}
+        missing = set()
+        posts = Post.objects.exclude(image='').select_related(
+            'author', 'group'
+        )
+        for post in posts.iterator():
+            old_name = post.image.name
+            if is_hashed(old_name) or old_name in missing:
+                continue
+            if old_name not in renamed:
+                if not storage.exists(old_name):
+                    missing.add(old_name)
+                    continue
+                with storage.open(old_name) as content:
+                    renamed[old_name] = (
+                        storage.hashed_name(old_name, content) if dry_run
+                        else storage.save(old_name, content)
+                    )
+            if dry_run:
+                continue
+            post.image.name = renamed[old_name]
+            # save, а не update: сигналы сбросят кэш страниц поста
+            post.save(update_fields=['image'])
+            thumbnails.pregenerate(post)
+        if not dry_run:
+            self._remove_old(renamed)
+        self.stdout.write(self.style.SUCCESS(
+            f'Файлов переименовано: {len(renamed)}, '
+            f'уникальных осталось: {len(set(renamed.values()))}, '
+            f'не найдено: {len(missing)}'
+        ))
+
+    def _remove_old(self, renamed):
+        referenced = set(Post.objects.filter(
+            image__in=renamed
+        ).values_list('image', flat=True))
+        for old_name in renamed.keys() - referenced:
+            cleanup.remove(old_name)
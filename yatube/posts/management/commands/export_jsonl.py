@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = 'Выгружает группы, посты, комментарии и подписки в JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-o', '--output', default='-',
+            help='Файл для выгрузки (по умолчанию stdout)'
+        )
+        parser.add_argument(
+            '--models', nargs='+', choices=bulk.MODELS, default=bulk.MODELS,
+            help='Что выгружать'
+        )
+
+    def handle(self, *args, **options):
+        models = [name for name in bulk.MODELS if name in options['models']]
+        if options['output'] == '-':
+            self._export(self.stdout, models, report=self.stderr)
+            return
+        with open(options['output'], 'w', encoding='utf-8') as stream:
+            self._export(stream, models, report=self.stdout)
+
+    def _export(self, stream, models, report):
+        started = time.monotonic()
+        for name, count in bulk.dump(stream, models):
+            elapsed = time.monotonic() - started
+            report.write(
+                f'{name}: {count} строк, {count / max(elapsed, 1e-6):.0f}/с\n'
+            )
+            started = time.monotonic()
@@ -0,0 +1,55 @@
+import sys
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = 'Загружает группы, посты, комментарии и подписки из JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл с выгрузкой, - для stdin'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=bulk.BATCH_SIZE,
+            help='Строк в одной транзакции'
+        )
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Не пересчитывать счётчики, ленты и поиск после загрузки'
+        )
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            self._import(sys.stdin, options)
+        else:
+            with open(options['path'], encoding='utf-8') as lines:
+                self._import(lines, options)
+
+    def _import(self, lines, options):
+        read, saved = Counter(), Counter()
+        started = time.monotonic()
+        for name, batch_read, batch_saved in bulk.load(
+            lines, options['batch_size']
+        ):
+            read[name] += batch_read
+            saved[name] += batch_saved
+        elapsed = max(time.monotonic() - started, 1e-6)
+        for name in bulk.MODELS:
+            if read[name]:
+                self.stdout.write(
+                    f'{name}: прочитано {read[name]}, '
+                    f'добавлено {saved[name]}'
+                )
+        total = sum(read.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено {total} строк за {elapsed:.1f} с, '
+            f'{total / elapsed:.0f} строк/с'
+        ))
+        if not options['no_rebuild']:
+            bulk.rebuild_derived()
+            self.stdout.write('Счётчики, ленты и поиск пересчитаны')
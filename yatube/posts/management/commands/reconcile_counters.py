@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок'
+
+    def handle(self, *args, **options):
+        fixed_stats, fixed_posts = counters.reconcile()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков пользователей: {fixed_stats}, '
+            f'постов: {fixed_posts}'
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает список рекомендуемых авторов (запускать по cron)'
+
+    def handle(self, *args, **options):
+        authors = suggestions.refresh()
+        self.stdout.write(self.style.SUCCESS(
+            f'Рекомендуемых авторов: {len(authors)}'
+        ))
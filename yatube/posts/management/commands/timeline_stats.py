@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает, сколько читателей получают ленту подписок каждым путём'
+    )
+
+    def handle(self, *args, **options):
+        for path, count in timeline.path_stats().items():
+            self.stdout.write(f'{path}: {count}')
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+CREATE_INDEX = """
+CREATE VIRTUAL TABLE posts_search USING fts5(
+    post_id UNINDEXED,
+    kind UNINDEXED,
+    object_id UNINDEXED,
+    text,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+FILL_INDEX = """
+INSERT INTO posts_search(rowid, post_id, kind, object_id, text)
+SELECT id * 2, id, 'post', id, text FROM posts_post
+UNION ALL
+SELECT id * 2 + 1, post_id, 'comment', id, text FROM posts_comment
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [CREATE_INDEX, FILL_INDEX],
+            'DROP TABLE posts_search',
+        ),
+    ]
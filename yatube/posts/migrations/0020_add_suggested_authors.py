@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-17 08:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0019_add_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuggestedAuthor',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('rank', models.PositiveIntegerField(verbose_name='Место в списке')),
+            ],
+            options={
+                'verbose_name': 'рекомендуемый автор',
+                'verbose_name_plural': 'рекомендуемые авторы',
+                'ordering': ('rank',),
+            },
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from django.db import models
 
 from core.models import CreatedModel
+from .storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -41,17 +42,44 @@ class Post(CreatedModel):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'), name='post_date_idx'),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_date_idx'
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_date_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        # Счётчик меняется только через F(): устаревший экземпляр
+        # не должен затирать его при сохранении
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'comments_count'
+            ]
+        super().save(*args, **kwargs)
+
 
 class Comment(CreatedModel):
     text = models.TextField(
@@ -71,6 +99,14 @@ class Comment(CreatedModel):
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('post', 'pub_date'),
+                name='comment_post_date_idx'
+            ),
+        )
+
     def __str__(self):
         return self.text[:50]  # Для ревьюера: обрезать таким образом норм?
 
@@ -86,3 +122,86 @@ class Follow(CreatedModel):
         related_name='following',
         on_delete=models.CASCADE
     )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_follow'
+            ),
+        )
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок читателя, разложенный при публикации."""
+    user = models.ForeignKey(
+        User,
+        related_name='timeline',
+        on_delete=models.CASCADE
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='timeline_entries',
+        on_delete=models.CASCADE
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        ordering = ('-pub_date', '-post_id')
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_timeline_entry'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='timeline_user_date_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='timeline_user_author_idx'
+            ),
+        )
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, чтобы не делать COUNT(*) на каждой странице."""
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='stats',
+        on_delete=models.CASCADE
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'счётчики пользователя'
+        verbose_name_plural = 'счётчики пользователей'
+
+
+class SuggestedAuthor(models.Model):
+    """
+    Автор из списка для читателя без подписок. Список пересчитывает
+    cron, а таблица видна всем процессам сразу.
+    """
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    rank = models.PositiveIntegerField('Место в списке')
+
+    class Meta:
+        ordering = ('rank',)
+        verbose_name = 'рекомендуемый автор'
+        verbose_name_plural = 'рекомендуемые авторы'
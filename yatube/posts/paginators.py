@@ -0,0 +1,171 @@
+import base64
+from collections.abc import Sequence
+
+from django.utils.dateparse import parse_datetime
+
+FORWARD = 'n'
+BACKWARD = 'p'
+CURSOR_KEYS = ('pub_date', 'id')
+ELLIPSIS = '…'
+
+
+def _encode_key(value):
+    # Кроме даты ключом бывает ранг поиска, repr float точен,
+    # и slug, который пишем как есть
+    if isinstance(value, str):
+        return value
+    return value.isoformat() if hasattr(value, 'isoformat') else repr(value)
+
+
+def encode_cursor(direction, position=None):
+    raw = direction
+    if position is not None:
+        key, pk = position
+        raw = f'{direction}|{_encode_key(key)}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, parse_key=parse_datetime):
+    """Кривой курсор считаем первой страницей, как Paginator.get_page."""
+    if not cursor:
+        return FORWARD, None
+    try:
+        raw = base64.urlsafe_b64decode(
+            cursor + '=' * (-len(cursor) % 4)
+        ).decode()
+        direction, *position = raw.split('|')
+        if direction not in (FORWARD, BACKWARD):
+            raise ValueError(direction)
+        if not position:
+            return direction, None
+        key, pk = position
+        key = parse_key(key)
+        if key is None:
+            raise ValueError(position)
+        return direction, (key, int(pk))
+    except ValueError:
+        return FORWARD, None
+
+
+def elided_page_range(page, on_each_side=3, on_ends=2):
+    """
+    Номера страниц вокруг текущей и по краям, пропуски - ELLIPSIS.
+    Как Paginator.get_elided_page_range из Django 3.2: ссылок не больше
+    2 * (on_each_side + on_ends) + 3 при любом числе страниц.
+    """
+    number = page.number
+    num_pages = page.paginator.num_pages
+    if num_pages <= (on_each_side + on_ends) * 2:
+        yield from page.paginator.page_range
+        return
+    if number > 1 + on_each_side + on_ends + 1:
+        yield from range(1, on_ends + 1)
+        yield ELLIPSIS
+        yield from range(number - on_each_side, number + 1)
+    else:
+        yield from range(1, number + 1)
+    if number < num_pages - on_each_side - on_ends - 1:
+        yield from range(number + 1, number + on_each_side + 1)
+        yield ELLIPSIS
+        yield from range(num_pages - on_ends + 1, num_pages + 1)
+    else:
+        yield from range(number + 1, num_pages + 1)
+
+
+def seek(queryset, keys, position, reverse, limit, descending=True):
+    """
+    Выборка limit строк после position в порядке ключей (по умолчанию
+    от новых к старым). Условие записано через диапазон по pub_date,
+    чтобы работал индекс.
+    """
+    date_key, id_key = keys
+    backwards = descending != reverse
+    if position is not None:
+        pub_date, pk = position
+        lookup, opposite = ('lte', 'gte') if backwards else ('gte', 'lte')
+        queryset = queryset.filter(
+            **{f'{date_key}__{lookup}': pub_date}
+        ).exclude(
+            **{date_key: pub_date, f'{id_key}__{opposite}': pk}
+        )
+    prefix = '-' if backwards else ''
+    return queryset.order_by(prefix + date_key, prefix + id_key)[:limit]
+
+
+class CursorPage(Sequence):
+    def __init__(self, object_list, paginator,
+                 next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Пагинация по ключу (pub_date, id): без COUNT(*) и OFFSET,
+    поэтому любая страница достаётся за одинаковое время.
+    """
+    first_cursor = ''
+    last_cursor = encode_cursor(BACKWARD)
+
+    def __init__(self, object_list, per_page, keys=CURSOR_KEYS,
+                 descending=True, parse_key=parse_datetime):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.keys = keys
+        self.descending = descending
+        self.parse_key = parse_key
+
+    def position(self, obj):
+        # Строки из .values() листаются так же, как объекты
+        if isinstance(obj, dict):
+            return tuple(obj[key] for key in self.keys)
+        return tuple(getattr(obj, key) for key in self.keys)
+
+    def get_page(self, cursor):
+        direction, position = decode_cursor(cursor, self.parse_key)
+        reverse = direction == BACKWARD
+        limit = self.per_page + 1
+        # Склеенные ленты умеют искать по ключу сами
+        custom_seek = getattr(self.object_list, 'seek', None)
+        if custom_seek is not None:
+            rows = custom_seek(self.keys, position, reverse, limit)
+        else:
+            rows = seek(
+                self.object_list, self.keys, position, reverse, limit,
+                self.descending
+            )
+        rows = list(rows)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+        has_next = has_more if not reverse else position is not None
+        has_previous = has_more if reverse else position is not None
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(FORWARD, self.position(rows[-1]))
+        if rows and has_previous:
+            previous_cursor = encode_cursor(
+                BACKWARD, self.position(rows[0])
+            )
+        return CursorPage(rows, self, next_cursor, previous_cursor)
@@ -0,0 +1,129 @@
+"""
+Полнотекстовый поиск по постам и комментариям на SQLite FTS5.
+Пост и каждый комментарий лежат в индексе отдельной строкой: rowid
+чётный у поста и нечётный у комментария, по нему строку и обновляем.
+"""
+import re
+from itertools import islice
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Comment, Post
+
+TABLE = 'posts_search'
+POST = 'post'
+COMMENT = 'comment'
+BATCH_SIZE = 500
+RANK_KEYS = ('search_rank', 'id')
+
+
+def _rowid(kind, pk):
+    return pk * 2 + (kind == COMMENT)
+
+
+def _row(kind, obj):
+    post_id = obj.pk if kind == POST else obj.post_id
+    return _rowid(kind, obj.pk), post_id, kind, obj.pk, obj.text
+
+
+def _insert(cursor, rows):
+    cursor.executemany(
+        f'INSERT INTO {TABLE}(rowid, post_id, kind, object_id, text) '
+        'VALUES (%s, %s, %s, %s, %s)',
+        rows
+    )
+
+
+def index(kind, obj):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE rowid = %s', [_rowid(kind, obj.pk)]
+        )
+        _insert(cursor, [_row(kind, obj)])
+
+
+def unindex(kind, pk):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE rowid = %s', [_rowid(kind, pk)]
+        )
+
+
+def rebuild():
+    """Заполняем индекс заново, возвращаем число проиндексированных строк."""
+    count = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        sources = (
+            (POST, Post.objects.only('text')),
+            (COMMENT, Comment.objects.only('text', 'post_id')),
+        )
+        for kind, objects in sources:
+            rows = (_row(kind, obj) for obj in objects.iterator())
+            batch = list(islice(rows, BATCH_SIZE))
+            while batch:
+                _insert(cursor, batch)
+                count += len(batch)
+                batch = list(islice(rows, BATCH_SIZE))
+        # Сливаем сегменты индекса в один
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+    return count
+
+
+def match_expression(query):
+    """Слова запроса как префиксы: синтаксис FTS5 пользователю не нужен."""
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', query))
+
+
+def matching(kind, query):
+    """Подзапрос с id найденных постов или комментариев, для pk__in."""
+    return RawSQL(
+        f'SELECT object_id FROM {TABLE} '
+        f'WHERE {TABLE} MATCH %s AND kind = %s',
+        (match_expression(query), kind)
+    )
+
+
+class SearchResults:
+    """
+    Посты по запросу, самые релевантные первыми. Пост находится и по
+    тексту, и по своим комментариям. Листается CursorPaginator'ом
+    по ключу (search_rank, id).
+    """
+
+    def __init__(self, query):
+        self.expression = match_expression(query)
+
+    def seek(self, keys, position, reverse, limit):
+        if not self.expression:
+            return []
+        params = [self.expression]
+        where = ''
+        if position is not None:
+            where = 'WHERE (search_rank, post_id) {} (%s, %s)'.format(
+                '<' if reverse else '>'
+            )
+            params.extend(position)
+        order = 'DESC' if reverse else 'ASC'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT post_id, search_rank FROM ('
+                f'SELECT post_id, MIN(rank) AS search_rank FROM {TABLE} '
+                f'WHERE {TABLE} MATCH %s GROUP BY post_id'
+                f') {where} '
+                f'ORDER BY search_rank {order}, post_id {order} LIMIT %s',
+                params
+            )
+            ranks = cursor.fetchall()
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [post_id for post_id, _ in ranks]
+        )
+        found = []
+        for post_id, search_rank in ranks:
+            post = posts.get(post_id)
+            if post is not None:
+                post.search_rank = search_rank
+                found.append(post)
+        return found
@@ -0,0 +1,132 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cleanup, counters, search, timeline
+from .caching import bump
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=Post)
+def post_published(sender, instance, created, **kwargs):
+    if created:
+        counters.post_added(instance)
+        timeline.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_removed(sender, instance, **kwargs):
+    counters.post_added(instance, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_published(sender, instance, created, **kwargs):
+    if created:
+        counters.comment_added(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_removed(sender, instance, **kwargs):
+    counters.comment_added(instance, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.follow_added(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_removed(sender, instance, **kwargs):
+    counters.follow_added(instance, -1)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_values(sender, instance, **kwargs):
+    instance._previous_group_slug = instance._previous_image = None
+    if instance.pk:
+        instance._previous_group_slug, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group__slug', 'image'
+            ).first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_image', None)
+    if previous != instance.image.name:
+        cleanup.release_on_commit(previous)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    cleanup.release_on_commit(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    scopes = {
+        'posts',
+        f'author:{instance.author.username}',
+        f'post:{instance.pk}',
+        f'card:{instance.pk}',
+    }
+    group_slugs = {getattr(instance, '_previous_group_slug', None)}
+    if instance.group_id:
+        group_slugs.add(instance.group.slug)
+    scopes.update(f'group:{slug}' for slug in group_slugs if slug)
+    bump(*scopes)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    bump(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    bump(f'author:{instance.author.username}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    bump('groups', f'group:{instance.slug}')
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    # У нового пользователя нет постов, а вход меняет только last_login
+    if created or update_fields and set(update_fields) == {'last_login'}:
+        return
+    # Имя автора есть в карточках на всех лентах с его постами
+    slugs = Group.objects.filter(
+        posts__author=instance
+    ).values_list('slug', flat=True).distinct()
+    bump(
+        'posts', f'user:{instance.pk}', f'author:{instance.username}',
+        *(f'group:{slug}' for slug in slugs)
+    )
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.index(search.POST, instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.unindex(search.POST, instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, **kwargs):
+    search.index(search.COMMENT, instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.unindex(search.COMMENT, instance.pk)
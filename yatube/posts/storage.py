@@ -0,0 +1,44 @@
+"""Хранилище, где имя файла - хеш его содержимого."""
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+HASHED_NAME = re.compile(r'(?:^|/)([0-9a-f]{2})/\1[0-9a-f]{62}(\.\w+)?$')
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def is_hashed(name):
+    return HASHED_NAME.search(name) is not None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Одинаковые загрузки ложатся в один файл posts/ab/abcd....gif
+    и поэтому получают один набор миниатюр.
+    """
+
+    def hashed_name(self, name, content):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        digest = content_hash(content)
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        return self._save(name, content)
@@ -0,0 +1,28 @@
+"""Подписки: запись одним запросом, дубли отсекает уникальный индекс."""
+from django.db import IntegrityError, transaction
+
+from . import timeline
+from .models import Follow
+
+
+def follow(user, author):
+    """Подписываем и возвращаем новое состояние: подписан ли user."""
+    if user == author:
+        return False
+    try:
+        with transaction.atomic():
+            Follow.objects.create(user=user, author=author)
+    except IntegrityError:
+        return True
+    timeline.follow(user, author)
+    return True
+
+
+def unfollow(user, author):
+    """Отписываем и возвращаем новое состояние: подписан ли user."""
+    deleted, _ = Follow.objects.filter(
+        user_id=user.pk, author_id=author.pk
+    ).delete()
+    if deleted:
+        timeline.unfollow(user, author)
+    return False
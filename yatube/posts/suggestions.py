@@ -0,0 +1,40 @@
+"""Короткий список авторов, которых предлагаем читателю без подписок."""
+from django.conf import settings
+from django.db import transaction
+
+from .models import SuggestedAuthor, UserStats
+
+
+def refresh():
+    """Пересчитываем список: самые читаемые и пишущие авторы."""
+    user_ids = UserStats.objects.filter(
+        posts_count__gt=0
+    ).order_by(
+        '-followers_count', '-posts_count'
+    ).values_list('user_id', flat=True)[:settings.SUGGESTED_AUTHORS_LIMIT + 1]
+    with transaction.atomic():
+        SuggestedAuthor.objects.all().delete()
+        return SuggestedAuthor.objects.bulk_create(
+            SuggestedAuthor(user_id=user_id, rank=rank)
+            for rank, user_id in enumerate(user_ids)
+        )
+
+
+def _authors(user):
+    return [
+        {'username': username, 'full_name': f'{first} {last}'.strip()}
+        for username, first, last in SuggestedAuthor.objects.exclude(
+            user_id=user.pk
+        ).values_list(
+            'user__username', 'user__first_name', 'user__last_name'
+        )[:settings.SUGGESTED_AUTHORS_LIMIT]
+    ]
+
+
+def suggested_authors(user):
+    authors = _authors(user)
+    if not authors and not SuggestedAuthor.objects.exists():
+        # cron ещё не запускался
+        refresh()
+        authors = _authors(user)
+    return authors
@@ -0,0 +1,48 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+
+register = template.Library()
+
+
+class CardCacheNode(template.Node):
+    def __init__(self, nodelist, post, flags):
+        self.nodelist = nodelist
+        self.post = post
+        self.flags = flags
+
+    def render(self, context):
+        post = self.post.resolve(context)
+        version = getattr(post, 'card_version', None)
+        if version is None or getattr(post, 'thumbnails_pending', False):
+            # Версию не проставили - кэшировать не с чем сверять;
+            # карточку без ещё не нарезанной картинки тоже не храним
+            return self.nodelist.render(context)
+        flags = ''.join(
+            str(int(bool(flag.resolve(context)))) for flag in self.flags
+        )
+        key = f'card:{post.pk}:{version}:{flags}'
+        html = cache.get(key)
+        if html is None:
+            html = self.nodelist.render(context)
+            cache.set(key, html, settings.PAGE_CACHE_TIMEOUT)
+        return html
+
+
+@register.tag
+def cache_card(parser, token):
+    """
+    {% cache_card post flag ... %}...{% endcache_card %} - готовый HTML
+    карточки из кэша. Ключ: id поста, post.card_version
+    (caching.stamp_versions) и флаги, от которых зависит разметка.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f'{bits[0]} ждёт пост')
+    nodelist = parser.parse(('endcache_card',))
+    parser.delete_first_token()
+    return CardCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
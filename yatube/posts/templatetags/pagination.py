@@ -0,0 +1,14 @@
+from django import template
+
+from posts.paginators import ELLIPSIS, elided_page_range
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_window(page_obj):
+    """Номера для ссылок пагинатора: окно вокруг текущей и края."""
+    return [
+        {'number': number, 'is_gap': number == ELLIPSIS}
+        for number in elided_page_range(page_obj)
+    ]
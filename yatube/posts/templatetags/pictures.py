@@ -0,0 +1,32 @@
+from django import template
+from django.conf import settings
+
+register = template.Library()
+
+MIME_TYPES = {
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+}
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def picture(post, css_class='', sizes='(max-width: 960px) 100vw, 960px'):
+    """<picture> из миниатюр, которые подложил thumbnails.hydrate."""
+    srcsets = {}
+    for thumbnail, (_, options) in zip(
+        post.thumbnails, settings.POST_THUMBNAILS
+    ):
+        srcsets.setdefault(options['format'], []).append(
+            f'{thumbnail.url} {thumbnail.width}w'
+        )
+    return {
+        'sources': [
+            {'type': MIME_TYPES[image_format], 'srcset': ', '.join(items)}
+            for image_format, items in srcsets.items()
+        ],
+        'image': post.thumbnail,
+        'css_class': css_class,
+        'sizes': sizes,
+    }
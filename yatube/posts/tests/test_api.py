@@ -0,0 +1,137 @@
+from django.core.cache import cache
+from django.test import override_settings, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author,
+                group=cls.group if item % 2 else None,
+                text=f'Пост №{item}',
+            )
+            for item in range(15)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.author, text='Коммент'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response.json()
+
+    def test_cursor_walks_forward_and_back(self):
+        """Курсор проходит все посты и возвращается назад"""
+        url = reverse('api:posts')
+        first = self.get(url, limit=10)
+        self.assertEqual(
+            [post['id'] for post in first['results']],
+            [post.pk for post in self.posts[:4:-1]]
+        )
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        self.assertEqual(
+            [post['id'] for post in second['results']],
+            [post.pk for post in self.posts[4::-1]]
+        )
+        self.assertIsNone(second['next'])
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_sparse_fields(self):
+        post = self.get(
+            reverse('api:posts'), fields='id,author,group'
+        )['results'][0]
+        self.assertEqual(post, {
+            'id': self.posts[-1].pk, 'author': 'author', 'group': None
+        })
+
+    def test_pages_in_constant_queries(self):
+        """Одна выборка на страницу, сколько бы ни было постов"""
+        with self.assertNumQueries(1):
+            self.client.get(reverse('api:posts'))
+        with self.assertNumQueries(2):
+            self.client.get(reverse('api:group_posts', args=('api',)))
+        with self.assertNumQueries(2):
+            self.client.get(reverse('api:profile_posts', args=('author',)))
+
+    def test_filtered_lists(self):
+        group = self.get(reverse('api:group_posts', args=('api',)))
+        self.assertEqual(len(group['results']), 7)
+        self.assertTrue(all(
+            post['group'] == 'api' for post in group['results']
+        ))
+        comments = self.get(
+            reverse('api:comments', args=(self.posts[0].pk,))
+        )['results']
+        self.assertEqual(
+            [(comment['post'], comment['text']) for comment in comments],
+            [(self.posts[0].pk, 'Коммент')]
+        )
+        groups = self.get(reverse('api:groups'))
+        self.assertEqual(groups['results'][0]['slug'], 'api')
+
+    def test_errors_are_json(self):
+        cases = (
+            (reverse('api:posts'), {'fields': 'id,password'}, 400),
+            (reverse('api:posts'), {'limit': 1000}, 400),
+            (reverse('api:posts'), {'limit': 'all'}, 400),
+            (reverse('api:group_posts', args=('missing',)), {}, 404),
+            (reverse('api:profile_posts', args=('missing',)), {}, 404),
+            (reverse('api:comments', args=(10 ** 6,)), {}, 404),
+            (reverse('api:follow'), {}, 401),
+        )
+        for url, params, status in cases:
+            with self.subTest(url=url, params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
+        self.assertEqual(
+            self.client.post(reverse('api:posts')).status_code, 405
+        )
+
+
+@override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=1)
+class ApiFollowFeedTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.star = User.objects.create_user(username='star')
+        cls.blogger = User.objects.create_user(username='blogger')
+        Follow.objects.create(user=cls.user, author=cls.star)
+        Follow.objects.create(
+            user=User.objects.create_user(username='reader_2'),
+            author=cls.star
+        )
+        Follow.objects.create(user=cls.user, author=cls.blogger)
+
+    def test_hybrid_feed_as_values(self):
+        """Лента склеивает push и pull и листается курсором"""
+        posts = [
+            Post.objects.create(author=author, text=f'Пост №{item}')
+            for item, author in enumerate(
+                (self.star, self.blogger, self.star, self.blogger)
+            )
+        ]
+        self.client.force_login(self.user)
+        url = reverse('api:follow')
+        first = self.client.get(url, {'limit': 3, 'fields': 'id'}).json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual(
+            [post['id'] for post in first['results'] + second['results']],
+            [post.pk for post in posts[::-1]]
+        )
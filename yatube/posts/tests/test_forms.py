@@ -1,11 +1,21 @@
+import hashlib
+import os
 import shutil
 import tempfile
+from io import BytesIO, StringIO
 
 from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.core.management import call_command
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
 from django.urls import reverse
+from PIL import Image
 
+from posts import thumbnails
 from posts.models import Group, Post, User
 
 CREATE_URL = 'posts:post_create'
@@ -21,6 +31,8 @@ SMALL_GIF = (
     b'\x02\x00\x01\x00\x00\x02\x02\x0C'
     b'\x0A\x00\x3B'
 )
+SMALL_GIF_HASH = hashlib.sha256(SMALL_GIF).hexdigest()
+SMALL_GIF_NAME = f'posts/{SMALL_GIF_HASH[:2]}/{SMALL_GIF_HASH}.gif'
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -78,7 +90,7 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(last_post.text, form_data['text'])
         self.assertEqual(last_post.group.pk, form_data['group'])
         self.assertEqual(last_post.author, self.user)
-        self.assertEqual(last_post.image.name, 'posts/small.gif')
+        self.assertEqual(last_post.image.name, SMALL_GIF_NAME)
 
     def test_form_edit(self):
         """Проверка возможности редактирования поста"""
@@ -100,4 +112,197 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(last_post.text, form_data['text'])
         self.assertEqual(last_post.group.pk, form_data['group'])
         self.assertEqual(last_post.author, self.user)
-        self.assertEqual(last_post.image.name, 'posts/my.gif')
+        self.assertEqual(last_post.image.name, SMALL_GIF_NAME)
+
+    @override_settings(BACKGROUND_WORKERS=0)
+    def test_thumbnails_pregenerated_on_upload(self):
+        """Миниатюры нарезаны до первого показа поста"""
+        def thumbs():
+            return {
+                name for _, _, files in os.walk(
+                    os.path.join(TEMP_MEDIA_ROOT, 'cache')
+                ) for name in files
+            }
+
+        before = thumbs()
+        content = BytesIO()
+        Image.new('RGB', (3, 1), 'red').save(content, 'PNG')
+        form_data = {
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(
+                name='thumb.png',
+                content=content.getvalue(),
+                content_type='image/png'
+            ),
+        }
+        self.authorized_client.post(reverse(CREATE_URL), data=form_data)
+        created = thumbs() - before
+        self.assertEqual(len(created), len(settings.POST_THUMBNAILS))
+        post = Post.objects.get(text=form_data['text'])
+        self.authorized_client.get(
+            reverse('posts:post_detail', args=[post.pk])
+        )
+        self.assertEqual(thumbs() - before, created)
+
+    @override_settings(POST_IMAGE_MAX_SIDE=40)
+    def test_big_image_is_downscaled_without_metadata(self):
+        """Большой оригинал уменьшается, EXIF вырезается"""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        content = BytesIO()
+        Image.new('RGB', (200, 100)).save(content, 'JPEG', exif=exif)
+        form_data = {
+            'text': 'Большая картинка',
+            'image': SimpleUploadedFile(
+                name='big.jpg',
+                content=content.getvalue(),
+                content_type='image/jpeg'
+            ),
+        }
+        self.authorized_client.post(reverse(CREATE_URL), data=form_data)
+        post = Post.objects.get(text=form_data['text'])
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (40, 20))
+            self.assertNotIn('exif', image.info)
+
+    @override_settings(POST_IMAGE_MAX_SIDE=40)
+    def test_rotated_image_is_downscaled_then_turned(self):
+        """Поворот по EXIF применяется к уже уменьшенной картинке"""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        content = BytesIO()
+        Image.new('RGB', (200, 100)).save(content, 'PNG', exif=exif)
+        self.authorized_client.post(reverse(CREATE_URL), data={
+            'text': 'Повёрнутая картинка',
+            'image': SimpleUploadedFile(
+                name='rotated.png',
+                content=content.getvalue(),
+                content_type='image/png'
+            ),
+        })
+        post = Post.objects.get(text='Повёрнутая картинка')
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (20, 40))
+            self.assertNotIn('exif', image.info)
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1)
+    def test_image_with_too_many_pixels_is_rejected(self):
+        """Картинку больше лимита пикселей не сохраняем"""
+        posts_count = Post.objects.count()
+        response = self.authorized_client.post(reverse(CREATE_URL), data={
+            'text': 'Бомба',
+            'image': SimpleUploadedFile(
+                name='bomb.gif',
+                content=SMALL_GIF,
+                content_type='image/gif'
+            ),
+        })
+        self.assertEqual(Post.objects.count(), posts_count)
+        self.assertTrue(response.context['form'].has_error('image'))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DedupeMediaTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_same_uploads_share_one_file(self):
+        """Одинаковые картинки хранятся одним файлом"""
+        user = User.objects.create_user(username='uploader')
+        names = {
+            Post.objects.create(
+                author=user,
+                text=f'Пост {item}',
+                image=SimpleUploadedFile(
+                    name=f'image_{item}.gif',
+                    content=SMALL_GIF,
+                    content_type='image/gif'
+                ),
+            ).image.name
+            for item in range(2)
+        }
+        self.assertEqual(names, {SMALL_GIF_NAME})
+
+    def test_dedupe_media_command(self):
+        """Команда переносит старые файлы на хеш и удаляет дубликаты"""
+        user = User.objects.create_user(username='legacy')
+        legacy = ('posts/image.gif', 'posts/image_00U4HrK.gif')
+        for name in legacy:
+            default_storage.save(name, ContentFile(SMALL_GIF))
+            Post.objects.create(author=user, text=name, image=name)
+        call_command('dedupe_media', stdout=StringIO())
+        self.assertEqual(
+            set(Post.objects.values_list('image', flat=True)),
+            {SMALL_GIF_NAME}
+        )
+        for name in legacy:
+            self.assertFalse(default_storage.exists(name))
+        self.assertTrue(default_storage.exists(SMALL_GIF_NAME))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, BACKGROUND_WORKERS=0)
+class MediaCleanupTest(TransactionTestCase):
+    """on_commit срабатывает только вне транзакции теста"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='cleaner')
+
+    def create_post(self, color):
+        content = BytesIO()
+        Image.new('RGB', (2, 2), color).save(content, 'PNG')
+        post = Post.objects.create(
+            author=self.user,
+            text=color,
+            image=SimpleUploadedFile('cleanup.png', content.getvalue()),
+        )
+        thumbnails.pregenerate(post)
+        return post, thumbnails.hydrate([post])[0].thumbnails
+
+    def test_deleted_image_is_removed_with_thumbnails(self):
+        """Картинка удалённого поста удаляется вместе с миниатюрами"""
+        post, thumbs = self.create_post('blue')
+        shared, _ = self.create_post('blue')
+        post.delete()
+        self.assertTrue(default_storage.exists(shared.image.name))
+        shared.delete()
+        self.assertFalse(default_storage.exists(shared.image.name))
+        for thumbnail in thumbs:
+            self.assertFalse(default_storage.exists(thumbnail.name))
+
+    def test_replaced_image_is_removed(self):
+        """Заменённая картинка удаляется"""
+        post, _ = self.create_post('green')
+        old_name = post.image.name
+        post.image = SimpleUploadedFile('new.gif', SMALL_GIF)
+        post.save()
+        self.assertFalse(default_storage.exists(old_name))
+        self.assertTrue(default_storage.exists(post.image.name))
+
+    def test_collect_media_is_resumable(self):
+        """Сборщик убирает сирот по частям"""
+        post, _ = self.create_post('yellow')
+        orphan = default_storage.save(
+            f'posts/{"0" * 2}/{"0" * 64}.gif', ContentFile(SMALL_GIF)
+        )
+        orphan_thumb = default_storage.save(
+            'cache/00/00/orphan.jpg', ContentFile(SMALL_GIF)
+        )
+        out = StringIO()
+        call_command('collect_media', '--min-age=0', '--limit=1', stdout=out)
+        resume = out.getvalue().split('--start-after ')[1].strip()
+        call_command(
+            'collect_media', '--min-age=0', f'--start-after={resume}',
+            stdout=StringIO()
+        )
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertFalse(default_storage.exists(orphan_thumb))
+        self.assertTrue(default_storage.exists(post.image.name))
+        for thumbnail in thumbnails.hydrate([post])[0].thumbnails:
+            self.assertTrue(default_storage.exists(thumbnail.name))
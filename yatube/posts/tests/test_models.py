@@ -1,6 +1,12 @@
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-from posts.models import Group, Post, User
+from posts.models import (
+    Comment, Follow, Group, Post, TimelineEntry, User, UserStats
+)
 
 
 class PostModelTest(TestCase):
@@ -52,3 +58,122 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, expected_value)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def test_counters_follow_creates_and_deletes(self):
+        """Счётчики меняются вместе с постами, комментариями и подписками"""
+        post = Post.objects.create(author=self.author, text='Текст')
+        Post.objects.create(author=self.author, text='Ещё текст')
+        Comment.objects.create(post=post, author=self.reader, text='Ого')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.author.stats.posts_count, 2)
+        self.assertEqual(self.author.stats.followers_count, 1)
+        self.assertEqual(self.reader.stats.following_count, 1)
+
+        follow.delete()
+        post.comments.all().delete()
+        post.delete()
+        self.author.stats.refresh_from_db()
+        self.reader.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 1)
+        self.assertEqual(self.author.stats.followers_count, 0)
+        self.assertEqual(self.reader.stats.following_count, 0)
+
+    def test_deletes_survive_drifted_counters(self):
+        """Удаление не падает, если счётчик уже разошёлся до нуля"""
+        author = User.objects.create_user(username='bulk_author')
+        UserStats.objects.create(user=author)
+        Post.objects.bulk_create([Post(author=author, text='Мимо сигналов')])
+        post = Post.objects.get(author=author)
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.reader, text='Тоже мимо')
+        ])
+        Comment.objects.get(post=post).delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        Post.objects.bulk_create([Post(author=author, text='Ещё один')])
+        author.delete()
+        self.assertFalse(Post.objects.filter(text='Ещё один').exists())
+
+    def test_reconcile_counters_command(self):
+        """Команда исправляет разъехавшиеся счётчики"""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Текст {item}')
+            for item in range(3)
+        )
+        post = Post.objects.first()
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.reader, text='Ого')
+        ])
+        call_command('reconcile_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 3
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).posts_count, 0
+        )
+
+
+class BulkJsonlTest(TestCase):
+    def test_export_and_import_round_trip(self):
+        """Выгрузка загружается обратно со всеми связями и датами"""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='bulk', description='Описание'
+        )
+        post = Post.objects.create(author=author, group=group, text='Пост')
+        Comment.objects.create(post=post, author=reader, text='Коммент')
+        Follow.objects.create(user=reader, author=author)
+        pub_date = Post.objects.get().pub_date
+
+        dump = StringIO()
+        call_command('export_jsonl', stdout=dump, stderr=StringIO())
+        self.assertEqual(len(dump.getvalue().splitlines()), 4)
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        # В базе, куда загружаем, id исходного поста уже занят
+        local = Post.objects.create(
+            id=post.pk,
+            author=User.objects.create_user(username='local'),
+            text='Местный пост',
+        )
+
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as source:
+            source.write(dump.getvalue())
+            source.flush()
+            out = StringIO()
+            call_command('import_jsonl', source.name, stdout=out)
+            again = StringIO()
+            call_command('import_jsonl', source.name, stdout=again)
+        self.assertIn('строк/с', out.getvalue())
+        self.assertIn('post: прочитано 1, добавлено 1', out.getvalue())
+        self.assertIn('comment: прочитано 1, добавлено 1', out.getvalue())
+        self.assertIn('post: прочитано 1, добавлено 0', again.getvalue())
+        self.assertIn('comment: прочитано 1, добавлено 0', again.getvalue())
+        local.refresh_from_db()
+        self.assertEqual(local.text, 'Местный пост')
+        self.assertFalse(local.comments.exists())
+        post = Post.objects.select_related('author__stats', 'group').get(
+            author__username='author'
+        )
+        self.assertNotEqual(post.pk, local.pk)
+        self.assertEqual(post.pub_date, pub_date)
+        self.assertEqual(post.group.slug, 'bulk')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.comments.get().author.username, 'reader')
+        self.assertEqual(post.author.stats.followers_count, 1)
+        self.assertEqual(Follow.objects.get().user.username, 'reader')
+        self.assertTrue(
+            TimelineEntry.objects.filter(user__username='reader').exists()
+        )
@@ -0,0 +1,68 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+FILESORT = 'USE TEMP B-TREE'
+FULL_SCAN = re.compile(r'SCAN (TABLE )?posts_\w+( |$)(?!USING)')
+
+
+class QueryPlanTests(TestCase):
+    """Каждая страница читает посты по индексу, без сортировки в памяти"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Тестовый пост',
+        )
+        Comment.objects.create(post=cls.post, author=cls.user, text='Ого')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def query_plans(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'posts_' not in sql:
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                yield sql, ' / '.join(row[-1] for row in cursor.fetchall())
+
+    def test_views_use_indexes(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:follow_index'),
+            reverse('api:posts'),
+            reverse('api:group_posts', args=[self.group.slug]),
+            reverse('api:profile_posts', args=[self.author.username]),
+            reverse('api:comments', args=[self.post.pk]),
+            reverse('api:follow'),
+        )
+        for url in urls:
+            for query in ('', '?cursor='):
+                for sql, plan in self.query_plans(url + query):
+                    with self.subTest(url=url + query, sql=sql):
+                        self.assertNotIn(FILESORT, plan)
+                        self.assertNotRegex(plan, FULL_SCAN)
@@ -1,12 +1,25 @@
+import hashlib
+import io
+import json
 import shutil
 import tempfile
+import zipfile
+from datetime import timedelta
+from io import StringIO
 
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.paginator import Paginator
 from django.test import Client, override_settings, TestCase
 from django.urls import reverse
 from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from posts.models import Comment, Follow, Group, Post, User
+from posts import benchmark, timeline
+from posts.caching import stamp_versions
+from posts.paginators import ELLIPSIS, elided_page_range
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
 import yatube.settings as settings
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -18,6 +31,8 @@ SMALL_GIF = (
     b'\x02\x00\x01\x00\x00\x02\x02\x0C'
     b'\x0A\x00\x3B'
 )
+SMALL_GIF_HASH = hashlib.sha256(SMALL_GIF).hexdigest()
+SMALL_GIF_NAME = f'posts/{SMALL_GIF_HASH[:2]}/{SMALL_GIF_HASH}.gif'
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -90,7 +105,7 @@ class PostViewTests(TestCase):
         )
         self.assertEqual(post_object.text, self.post.text)
         self.assertEqual(post_object.group, self.post.group)
-        self.assertEqual(post_object.image.name, 'posts/small.gif')
+        self.assertEqual(post_object.image.name, SMALL_GIF_NAME)
 
     def test_pages_uses_correct_template(self):
         for reverse_name, template in self.templates_pages_names.items():
@@ -153,11 +168,151 @@ class PostViewTests(TestCase):
             'posts:post_detail',
             kwargs={'post_id': self.post.id}
         ))
+        self.assertIn(
+            self.comment,
+            response.context['comments'],
+            'Комментарий не виден на странице поста'
+        )
+
+    def test_comments_are_paginated_in_constant_queries(self):
+        """Комментарии грузятся с авторами за постоянное число запросов"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.guest_client.get(url)
+        cache.clear()
+        with CaptureQueriesContext(connection) as few:
+            self.guest_client.get(url)
+        Comment.objects.bulk_create(
+            Comment(
+                post=self.post,
+                author=User.objects.create_user(username=f'user_{item}'),
+                text=f'Comment {item}',
+            )
+            for item in range(settings.COMMENTS_PER_PAGE)
+        )
+        cache.clear()
+        with CaptureQueriesContext(connection) as many:
+            response = self.guest_client.get(url)
+        self.assertEqual(len(few), len(many))
         comments = response.context['comments']
+        self.assertEqual(len(comments), settings.COMMENTS_PER_PAGE)
+        fragment = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+            + f'?cursor={comments.next_cursor}'
+        )
+        self.assertEqual(len(fragment.context['comments']), 1)
+        self.assertTemplateUsed(fragment, 'posts/includes/comments.html')
+
+    @override_settings(BACKGROUND_WORKERS=0)
+    def test_page_thumbnails_in_constant_queries(self):
+        """Миниатюры всей страницы достаются за постоянное число запросов"""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        cache.clear()
+        with CaptureQueriesContext(connection) as few:
+            self.guest_client.get(url)
+        for item in range(3):
+            Post.objects.create(
+                author=self.user,
+                text=f'Post {item}',
+                image=SimpleUploadedFile(
+                    name=f'small_{item}.gif',
+                    content=SMALL_GIF,
+                    content_type='image/gif'
+                ),
+            )
+        self.guest_client.get(url)
+        cache.clear()
+        with CaptureQueriesContext(connection) as many:
+            response = self.guest_client.get(url)
+        self.assertEqual(len(few), len(many))
+        for post in response.context['page_obj']:
+            self.assertContains(response, post.thumbnail.url)
+
+    @override_settings(BACKGROUND_WORKERS=0)
+    def test_post_image_has_responsive_variants(self):
+        """Картинка поста отдаётся в нескольких ширинах и в WebP"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        # Первый показ ставит нарезку в очередь
+        self.guest_client.get(url)
+        response = self.guest_client.get(url)
+        post = response.context['post']
+        self.assertEqual(len(post.thumbnails), len(settings.POST_THUMBNAILS))
+        self.assertContains(response, '<source type="image/webp"')
+        for width in settings.POST_THUMBNAIL_WIDTHS:
+            self.assertContains(response, f' {width}w')
+        webp = [
+            thumbnail for thumbnail in post.thumbnails
+            if thumbnail.name.endswith('.webp')
+        ]
+        self.assertEqual(len(webp), len(settings.POST_THUMBNAIL_WIDTHS))
+        self.assertTrue(webp[0].read().startswith(b'RIFF'))
+
+    def test_missing_thumbnails_are_queued_not_rendered(self):
+        """Без миниатюр пост показываем без картинки и страницу не кэшируем"""
+        cache.clear()
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        post = response.context['page_obj'][0]
+        self.assertTrue(post.thumbnails_pending)
+        self.assertIsNone(post.thumbnail)
+        self.assertNotContains(response, 'loading="lazy"')
+        self.assertIn('no-store', response['Cache-Control'])
         self.assertTrue(
-            comments.filter(text=self.comment).exists(),
-            'Комментарий не виден на странице поста'
+            cache.get(f'thumbnails:queued:{self.post.image.name}')
         )
+        self.assertIsNotNone(self.guest_client.get(url).context)
+
+    @override_settings(BACKGROUND_WORKERS=0)
+    def test_broken_image_is_not_pending_forever(self):
+        """Пропавший исходник: пост без картинки, страница снова кэшируется"""
+        cache.clear()
+        post = Post.objects.create(
+            author=self.user, text='Без файла', image='posts/missing.gif'
+        )
+        url = reverse('posts:index')
+        self.assertIn('no-store', self.guest_client.get(url)['Cache-Control'])
+        response = self.guest_client.get(url)
+        self.assertNotIn('no-store', response['Cache-Control'])
+        hydrated = response.context['page_obj'][0]
+        self.assertEqual(hydrated, post)
+        self.assertFalse(hydrated.thumbnails_pending)
+        self.assertIsNone(hydrated.thumbnail)
+        self.assertIsNone(self.guest_client.get(url).context)
+
+    def test_profile_export_zip(self):
+        """Архив с постами, комментариями и картинками отдаётся потоком"""
+        url = reverse('posts:profile_export', args=(self.user.username,))
+        response = self.authorized_client.get(url)
+        self.assertTrue(response.streaming)
+        archive = zipfile.ZipFile(
+            io.BytesIO(b''.join(response.streaming_content))
+        )
+        self.assertIsNone(archive.testzip())
+        posts = archive.read('posts.ndjson').decode().splitlines()
+        self.assertEqual(json.loads(posts[0])['image'], SMALL_GIF_NAME)
+        self.assertIn(
+            'TEST COMMENT', archive.read('comments.ndjson').decode()
+        )
+        self.assertEqual(
+            archive.read(f'images/{SMALL_GIF_NAME}'), SMALL_GIF
+        )
+
+    def test_profile_export_ndjson_only_for_owner(self):
+        """NDJSON-выгрузка доступна только самому пользователю"""
+        url = reverse('posts:profile_export', args=(self.user.username,))
+        response = self.authorized_client.get(url, {'format': 'ndjson'})
+        models = [
+            json.loads(line)['model']
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(models, ['post', 'comment'])
+        self.assertRedirects(
+            self.guest_client.get(url), f'/auth/login/?next={url}'
+        )
+        other = Client()
+        other.force_login(User.objects.create_user(username='other'))
+        profile = reverse('posts:profile', args=(self.user.username,))
+        self.assertRedirects(other.get(url), profile)
 
 
 class PaginatorViewTests(TestCase):
@@ -211,24 +366,454 @@ class PaginatorViewTests(TestCase):
                 response = self.client.get(reverse_name + '?page=2')
                 self.assertEqual(len(response.context['page_obj']), pages[1])
 
+    def test_page_range_is_windowed(self):
+        """Ссылок на страницы ограниченное число, сколько бы их ни было"""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Text №{item}')
+            for item in range(settings.POSTS_PER_PAGE * 30)
+        )
+        response = self.client.get(reverse('posts:index') + '?page=15')
+        self.assertEqual(response.content.decode().count('?page='), 14)
+        self.assertContains(response, '…', count=2)
+        self.assertContains(response, '?page=32')
+
+    def test_elided_page_range(self):
+        paginator = Paginator(range(10000), 1)
+        self.assertEqual(
+            list(elided_page_range(paginator.page(5000))),
+            [1, 2, ELLIPSIS, *range(4997, 5004), ELLIPSIS, 9999, 10000]
+        )
+        self.assertEqual(
+            list(elided_page_range(paginator.page(2))),
+            [1, 2, 3, 4, 5, ELLIPSIS, 9999, 10000]
+        )
+        self.assertEqual(
+            list(elided_page_range(Paginator(range(8), 1).page(4))),
+            list(range(1, 9))
+        )
+
+
+class CursorPaginatorViewTests(TestCase):
+    POSTS_ON_SECOND_PAGE = 3
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Test group',
+            slug='test_slug',
+            description='test description',
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Text №{item}', group=cls.group)
+            for item in range(
+                settings.POSTS_PER_PAGE + cls.POSTS_ON_SECOND_PAGE
+            )
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        """Курсор проходит все посты без повторов и возвращается назад"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.client.get(url + '?cursor=').context['page_obj']
+                self.assertEqual(len(first), settings.POSTS_PER_PAGE)
+                self.assertFalse(first.has_previous())
+                second = self.client.get(
+                    f'{url}?cursor={first.next_cursor}'
+                ).context['page_obj']
+                self.assertEqual(len(second), self.POSTS_ON_SECOND_PAGE)
+                self.assertFalse(second.has_next())
+                self.assertEqual(
+                    len({post.pk for post in [*first, *second]}),
+                    settings.POSTS_PER_PAGE + self.POSTS_ON_SECOND_PAGE
+                )
+                back = self.client.get(
+                    f'{url}?cursor={second.previous_cursor}'
+                ).context['page_obj']
+                self.assertEqual(list(back), list(first))
+
+    def test_broken_cursor_opens_first_page(self):
+        response = self.client.get(self.urls[0] + '?cursor=broken')
+        self.assertEqual(
+            len(response.context['page_obj']), settings.POSTS_PER_PAGE
+        )
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='searcher')
+        cls.posts = [
+            Post.objects.create(author=cls.user, text=f'Кошка №{item}')
+            for item in range(settings.POSTS_PER_PAGE + 2)
+        ]
+        cls.dog = Post.objects.create(author=cls.user, text='Собака')
+        Comment.objects.create(
+            post=cls.dog, author=cls.user, text='Рядом пробегала КОШКА'
+        )
+
+    def search(self, query, cursor=None):
+        url = reverse('posts:search') + f'?q={query}'
+        if cursor is not None:
+            url += f'&cursor={cursor}'
+        return self.client.get(url).context['page_obj']
+
+    def test_search_finds_posts_and_comments(self):
+        """Поиск находит посты по тексту и по комментариям"""
+        first = self.search('кошк')
+        second = self.search('кошк', first.next_cursor)
+        found = {post.pk for post in first} | {post.pk for post in second}
+        self.assertEqual(len(first), settings.POSTS_PER_PAGE)
+        self.assertIn(self.dog.pk, found)
+        self.assertEqual(len(found), len(self.posts) + 1)
+        self.assertFalse(second.has_next())
+        self.assertEqual(
+            [post.pk for post in self.search('кошк', second.previous_cursor)],
+            [post.pk for post in first]
+        )
+
+    def test_search_index_follows_changes(self):
+        """Индекс обновляется при правке и удалении поста"""
+        self.dog.text = 'Попугай'
+        self.dog.save()
+        self.assertEqual([post.pk for post in self.search('попугай')], [
+            self.dog.pk
+        ])
+        self.dog.delete()
+        self.assertEqual(len(self.search('попугай')), 0)
+
+    def test_rebuild_search_index_command(self):
+        """Команда пересобирает индекс"""
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn(str(len(self.posts) + 2), out.getvalue())
+        self.assertEqual(len(self.search('собака')), 1)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через полнотекстовый индекс"""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist') + '?q=собака'
+        )
+        self.assertEqual(list(response.context['cl'].result_list), [
+            self.dog
+        ])
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.author = User.objects.create_user(username='writer')
+        cls.groups = [
+            Group.objects.create(title=f'Group {item}', slug=f'group_{item}')
+            for item in range(3)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_posts(self, count):
+        for item in range(count):
+            post = Post.objects.create(
+                author=self.author,
+                text=f'Post {item}',
+                group=self.groups[item % len(self.groups)],
+            )
+            Comment.objects.create(post=post, author=self.admin, text='Ok')
+
+    def test_changelists_in_constant_queries(self):
+        """Списки в админке открываются за постоянное число запросов"""
+        for model in ('post', 'comment'):
+            with self.subTest(model=model):
+                url = reverse(f'admin:posts_{model}_changelist')
+                Post.objects.all().delete()
+                self.add_posts(2)
+                with CaptureQueriesContext(connection) as few:
+                    self.client.get(url)
+                self.add_posts(10)
+                with CaptureQueriesContext(connection) as many:
+                    response = self.client.get(url)
+                self.assertEqual(len(few), len(many))
+                self.assertEqual(len(response.context['cl'].result_list), 12)
+                self.assertFalse(any(
+                    query['sql'].startswith('SELECT COUNT(')
+                    for query in many.captured_queries
+                ))
+
+    def test_input_filters(self):
+        """Фильтры по автору и посту работают без списка значений"""
+        self.add_posts(2)
+        post = Post.objects.first()
+        response = self.client.get(
+            reverse('admin:posts_post_changelist') + '?author=nobody'
+        )
+        self.assertEqual(len(response.context['cl'].result_list), 0)
+        response = self.client.get(
+            reverse('admin:posts_comment_changelist') + f'?post={post.pk}'
+        )
+        self.assertEqual(
+            [comment.post for comment in response.context['cl'].result_list],
+            [post]
+        )
+
 
 class CacheIndexTest(TestCase):
 
     def test_index_cache(self):
-        response = self.client.get(reverse('posts:index'))
-        first = response.content
+        """Главная берётся из кэша, пока посты не менялись"""
+        first = self.client.get(reverse('posts:index')).content
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('posts:index')).content
+        self.assertEqual(first, second)
+
+    def test_index_cache_invalidated_by_new_post(self):
+        """Новый пост виден сразу, без ожидания и очистки кэша"""
+        first = self.client.get(reverse('posts:index')).content
         self.user = User.objects.create_user(username='auth')
         Post.objects.create(
             author=self.user,
             text='Test text',
         )
-        response = self.client.get(reverse('posts:index'))
-        second = response.content
+        second = self.client.get(reverse('posts:index')).content
+        self.assertNotEqual(first, second)
+
+    def test_post_detail_cache_invalidated_by_comment(self):
+        user = User.objects.create_user(username='auth')
+        post = Post.objects.create(author=user, text='Test text')
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        self.client.get(url)
+        Comment.objects.create(post=post, author=user, text='New comment')
+        self.assertContains(self.client.get(url), 'New comment')
+
+
+class PerUserPageCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username='alice')
+        cls.bob = User.objects.create_user(username='bob')
+        cls.post = Post.objects.create(author=cls.alice, text='Пост Алисы')
+
+    def setUp(self):
         cache.clear()
+
+    def client_for(self, user=None):
+        client = Client(enforce_csrf_checks=True)
+        if user:
+            client.force_login(user)
+        return client
+
+    def test_readers_do_not_get_each_others_pages(self):
+        """Страница, собранная для одного читателя, не уходит другому"""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        alice = self.client_for(self.alice)
+        self.assertContains(alice.get(url), 'редактировать запись')
+        bob = self.client_for(self.bob)
+        response = bob.get(url)
+        self.assertNotContains(response, 'редактировать запись')
+        self.assertEqual(response.context['user'], self.bob)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotContains(
+            self.client_for().get(url), 'редактировать запись'
+        )
+        token = response.context['csrf_token']
+        response = bob.post(
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            {'text': 'Комментарий Боба', 'csrfmiddlewaretoken': token},
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_profile_follow_button_is_per_reader(self):
+        url = reverse('posts:profile', args=('alice',))
+        self.assertContains(self.client_for(self.bob).get(url), 'Подписаться')
+        self.assertNotContains(self.client_for().get(url), 'Подписаться')
+
+
+class FeedTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Группа', slug='feeds', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Пост для ленты'
+        )
+        cls.urls = (
+            reverse('posts:feed_rss'),
+            reverse('posts:feed_atom'),
+            reverse('posts:group_rss', args=(cls.group.slug,)),
+            reverse('posts:group_atom', args=(cls.group.slug,)),
+            reverse('posts:profile_rss', args=(cls.user.username,)),
+            reverse('posts:profile_atom', args=(cls.user.username,)),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_contain_posts(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Пост для ленты')
+                self.assertContains(response, f'/posts/{self.post.pk}/')
+        self.assertEqual(
+            self.client.get(reverse('posts:feed_atom'))['Content-Type'],
+            'application/atom+xml; charset=utf-8'
+        )
+
+    def test_unchanged_feed_costs_no_queries(self):
+        """Без новых постов отвечаем 304, не трогая базу"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    ).status_code, 304)
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.client.get(
+                        url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                    ).status_code, 304)
+
+    def test_feed_validators_change_with_posts(self):
+        """Правка поста меняет ETag, хотя дата публикации прежняя"""
+        url = reverse('posts:group_rss', args=(self.group.slug,))
+        etag = self.client.get(url)['ETag']
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Исправленный пост')
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:group_rss', args=('missing',))
+            ).status_code,
+            404
+        )
+
+
+class CardCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Карточка')
+
+    def setUp(self):
+        cache.clear()
+
+    def card_key(self, flags):
+        post, = stamp_versions([self.post])
+        return f'card:{post.pk}:{post.card_version}:{flags}'
+
+    def test_cards_come_from_cache(self):
+        """Страница собирается из готовых карточек, правка их сбрасывает"""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:profile', args=('auth',)))
+        self.assertIn('Карточка', cache.get(self.card_key('01')))
+        self.assertIn('Карточка', cache.get(self.card_key('11')))
+        cache.set(self.card_key('01'), 'Готовая карточка')
+        # Новая запись сбрасывает кэш главной, но не карточки
+        Post.objects.create(author=self.user, text='Другой пост')
+        self.assertContains(
+            self.client.get(reverse('posts:index')), 'Готовая карточка'
+        )
+        self.post.text = 'Исправлено'
+        self.post.save()
         response = self.client.get(reverse('posts:index'))
-        third = response.content
-        self.assertEqual(first, second)
-        self.assertNotEqual(first, third)
+        self.assertContains(response, 'Исправлено')
+        self.assertNotContains(response, 'Готовая карточка')
+
+    def test_comment_keeps_card_and_rename_drops_it(self):
+        """Комментарий карточку не трогает, смена имени автора сбрасывает"""
+        self.client.get(reverse('posts:index'))
+        key = self.card_key('01')
+        Comment.objects.create(post=self.post, author=self.user, text='Ок')
+        self.assertEqual(self.card_key('01'), key)
+        self.client.force_login(self.user)
+        self.assertEqual(self.card_key('01'), key)
+        self.user.first_name = 'Новое'
+        self.user.last_name = 'Имя'
+        self.user.save()
+        self.assertNotEqual(self.card_key('01'), key)
+        self.assertContains(
+            self.client.get(reverse('posts:index')), 'Новое Имя'
+        )
+
+
+class ConditionalViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Группа', slug='etag', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Пост'
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(cls.group.slug,)),
+            reverse('posts:profile', args=(cls.user.username,)),
+            reverse('posts:post_detail', args=(cls.post.pk,)),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_repeat_visit_gets_304(self):
+        """Повторный визит без изменений получает 304 без шаблонов"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse(response.templates)
+
+    def test_etag_depends_on_reader_and_edits(self):
+        """Другой читатель и правка поста дают новый ETag"""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(self.user)
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+        etag = self.client.get(url)['ETag']
+        self.post.text = 'Правка'
+        self.post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Правка')
+
+    def test_comment_moves_last_modified(self):
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        last_modified = self.client.get(url)['Last-Modified']
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='Коммент'
+        )
+        Comment.objects.filter(pk=comment.pk).update(
+            pub_date=self.post.pub_date + timedelta(days=1)
+        )
+        cache.clear()
+        self.assertNotEqual(
+            self.client.get(url)['Last-Modified'], last_modified
+        )
 
 
 class FollowViewTest(TestCase):
@@ -275,6 +860,29 @@ class FollowViewTest(TestCase):
             'Отписка не произошла.'
         )
 
+    def test_follow_is_idempotent(self):
+        """Повторная подписка не создаёт дублей и возвращает состояние"""
+        url = reverse('posts:profile_follow', kwargs={
+            'username': self.post_author.username
+        })
+        response = self.follower.get(
+            url, HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(response.json(), {'following': True})
+        self.assertEqual(
+            Follow.objects.filter(
+                user=self.user, author=self.post_author
+            ).count(),
+            1
+        )
+        response = self.follower.get(
+            reverse('posts:profile_unfollow', kwargs={
+                'username': self.post_author.username
+            }),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(response.json(), {'following': False})
+
     def test_follow_index(self):
         """
         Проверяем, что после подписки в ленте появляется пост.
@@ -295,3 +903,197 @@ class FollowViewTest(TestCase):
             0,
             'В ленте пользователя без подписки появился пост. Неожиданно.',
         )
+
+    def test_new_post_goes_to_timeline(self):
+        """Новый пост автора сразу раскладывается в ленту подписчика"""
+        new_post = Post.objects.create(
+            author=self.post_author,
+            text='Fresh text'
+        )
+        feed = self.follower.get(
+            reverse('posts:follow_index')
+        ).context['page_obj']
+        self.assertEqual(list(feed), [new_post, self.post])
+
+    def test_follow_backfills_in_one_insert(self):
+        """Старые посты автора досыпаются в ленту одним запросом"""
+        author = User.objects.create_user(username='prolific')
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Text {item}')
+            for item in range(timeline.BATCH_SIZE + 1)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.follower.post(reverse(
+                'posts:profile_follow', kwargs={'username': 'prolific'}
+            ))
+        inserts = [
+            query for query in queries
+            if TimelineEntry._meta.db_table in query['sql']
+            and query['sql'].startswith('INSERT')
+        ]
+        self.assertEqual(len(inserts), 1)
+        entries = TimelineEntry.objects.filter(user=self.user, author=author)
+        self.assertEqual(entries.count(), timeline.BATCH_SIZE + 1)
+
+    def test_unfollow_clears_timeline(self):
+        self.follower.post(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.post_author.username}
+        ))
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user).exists())
+
+    def test_backfill_timeline_command(self):
+        TimelineEntry.objects.all().delete()
+        call_command('backfill_timeline', stdout=StringIO())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user, post=self.post
+        ).exists())
+
+
+@override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=1)
+class HybridFeedViewTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.another_reader = User.objects.create_user(username='reader_2')
+        cls.star = User.objects.create_user(username='star')
+        cls.blogger = User.objects.create_user(username='blogger')
+        Follow.objects.create(user=cls.user, author=cls.star)
+        Follow.objects.create(user=cls.another_reader, author=cls.star)
+        Follow.objects.create(user=cls.user, author=cls.blogger)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_star_posts_are_not_fanned_out(self):
+        """Посты популярного автора не раскладываются по лентам"""
+        Post.objects.create(author=self.star, text='Star text')
+        Post.objects.create(author=self.blogger, text='Blogger text')
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('author', flat=True)),
+            [self.blogger.pk]
+        )
+
+    def test_hybrid_feed_merges_push_and_pull(self):
+        posts = [
+            Post.objects.create(author=author, text=f'Text №{item}')
+            for item, author in enumerate(
+                (self.star, self.blogger, self.star, self.blogger)
+            )
+        ]
+        for query in ('', '?cursor='):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    reverse('posts:follow_index') + query
+                )
+                self.assertEqual(response['X-Feed-Path'], 'hybrid')
+                self.assertEqual(
+                    list(response.context['page_obj']), posts[::-1]
+                )
+
+    def test_pull_only_feed(self):
+        Follow.objects.filter(author=self.blogger).delete()
+        post = Post.objects.create(author=self.star, text='Star text')
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response['X-Feed-Path'], 'pull')
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    def test_feed_pages_are_sliced_in_sql(self):
+        """Страница push- и pull-ленты - один срез в БД, без склейки"""
+        for author in (self.star, self.blogger):
+            for item in range(3):
+                Post.objects.create(author=author, text=f'Text №{item}')
+        for author, path in ((self.blogger, 'push'), (self.star, 'pull')):
+            with self.subTest(path=path):
+                Follow.objects.filter(user=self.user).delete()
+                Follow.objects.create(user=self.user, author=author)
+                feed = timeline.Feed(self.user)
+                self.assertEqual(feed.path, path)
+                with self.assertNumQueries(1) as queries:
+                    page = feed[1:3]
+                self.assertIn('LIMIT 2 OFFSET 1', queries[0]['sql'])
+                self.assertEqual(
+                    page, list(Post.objects.filter(author=author)[1:3])
+                )
+
+    @override_settings(BACKGROUND_WORKERS=0)
+    def test_unfollow_backfills_author_back_in_push(self):
+        """Автор вернулся в push - его посты досыпаются подписчикам"""
+        post = Post.objects.create(author=self.star, text='Star text')
+        self.client.force_login(self.another_reader)
+        self.client.post(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.star.username}
+        ))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user, post=post
+        ).exists())
+
+    def test_timeline_stats_command(self):
+        out = StringIO()
+        call_command('timeline_stats', stdout=out)
+        self.assertEqual(out.getvalue(), 'push: 0\npull: 1\nhybrid: 1\n')
+
+
+@override_settings(SUGGESTED_AUTHORS_LIMIT=2)
+class SuggestedAuthorsViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        for item in range(4):
+            author = User.objects.create_user(username=f'author_{item}')
+            for _ in range(item + 1):
+                Post.objects.create(author=author, text='Text')
+        Post.objects.create(author=cls.user, text='Text')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_suggested_authors_are_bounded_and_stored(self):
+        """Без подписок предлагаем ограниченный список из таблицы"""
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [author['username'] for author in response.context['authors']],
+            ['author_3', 'author_2']
+        )
+        newcomer = User.objects.create_user(
+            username='newcomer', first_name='Новый', last_name='Автор'
+        )
+        for _ in range(5):
+            Post.objects.create(author=newcomer, text='Text')
+        call_command('refresh_suggested_authors', stdout=StringIO())
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            response.context['authors'][0],
+            {'username': 'newcomer', 'full_name': 'Новый Автор'}
+        )
+
+
+class BenchmarkTest(TestCase):
+
+    def test_seed_and_measure(self):
+        """Засев даёт связные данные, замер - все метрики по страницам"""
+        benchmark.seed(200)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertTrue(TimelineEntry.objects.exists())
+        results = benchmark.measure(repeat=3)
+        self.assertEqual(set(results), {
+            'index', 'index_deep', 'group_posts', 'profile', 'post_detail',
+            'follow_index',
+        })
+        for name, result in results.items():
+            with self.subTest(name=name):
+                self.assertEqual(result['statuses'], [200])
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+                self.assertGreater(result['queries_max'], 0)
+                self.assertGreater(result['peak_memory_kb'], 0)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 95), 7)
@@ -0,0 +1,155 @@
+"""
+Миниатюры режем сразу после загрузки картинки в фоновых процессах,
+чтобы страница никогда не ждала Pillow: чего ещё нет, то страница
+показывает без картинки и ставит в очередь.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from . import background
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Пока воркер режет, повторно картинку в очередь не ставим
+QUEUED_TIMEOUT = 60
+# Битый или пропавший исходник не режем заново на каждом показе
+BROKEN_TIMEOUT = 60 * 60 * 24
+
+
+def _broken_key(name):
+    return f'thumbnails:broken:{name}'
+
+
+def render(name, geometries):
+    """Нарезаем все миниатюры файла; ошибка одной не мешает остальным."""
+    # Хранилище поля входит в ключ kvstore, как и у post.image
+    source = ImageFile(name, Post._meta.get_field('image').storage)
+    broken = False
+    for geometry, options in geometries:
+        try:
+            thumbnail = get_thumbnail(source, geometry, **options)
+        except Exception:
+            logger.exception('Не удалось нарезать %s для %s', geometry, name)
+            broken = True
+            continue
+        # Не прочитав исходник, sorl молча отдаёт пустую миниатюру
+        # и ничего не пишет в kvstore
+        if not default.kvstore.get(thumbnail):
+            broken = True
+    if broken:
+        cache.set(_broken_key(name), True, BROKEN_TIMEOUT)
+
+
+def pregenerate(post):
+    if not post.image:
+        return
+    background.submit(render, post.image.name, settings.POST_THUMBNAILS)
+
+
+# Ниже - закрытые методы sorl-thumbnail 12.7 (версия закреплена
+# в requirements.txt): имя миниатюры без вызова get_thumbnail, который
+# на промахе режет картинку прямо в запросе. При обновлении sorl
+# сверить _get_format, _get_thumbnail_filename и extra_options.
+
+
+def _full_options(source, options):
+    """Те же умолчания, что подставляет get_thumbnail: от них зависит имя."""
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def _store_key(source, geometry, options):
+    name = default.backend._get_thumbnail_filename(
+        source, geometry, _full_options(source, options)
+    )
+    return add_prefix(ImageFile(name, default.storage).key)
+
+
+def _get_many(keys):
+    """Один get_many в кэш и один запрос в таблицу kvstore на промахи."""
+    kvstore_cache = default.kvstore.cache
+    values = {
+        key: value for key, value in kvstore_cache.get_many(keys).items()
+        if isinstance(value, str)
+    }
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(KVStore.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        kvstore_cache.set_many(found, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(found)
+    return values
+
+
+def _requeue(post):
+    if cache.add(f'thumbnails:queued:{post.image.name}', True, QUEUED_TIMEOUT):
+        pregenerate(post)
+
+
+def pending(posts):
+    return any(getattr(post, 'thumbnails_pending', False) for post in posts)
+
+
+def hydrate(posts):
+    """
+    Подкладываем постам страницы готовые миниатюры: post.thumbnails
+    в порядке POST_THUMBNAILS и post.thumbnail - последнюю, для <img>.
+    Если какой-то нет, пост идёт без картинки с post.thumbnails_pending,
+    а нарезка уходит в фон. Посты с картинкой, которую нарезать
+    не удалось, идут просто без картинки.
+    """
+    posts = list(posts)
+    keys = []
+    for post in posts:
+        post.thumbnails = []
+        post.thumbnail = None
+        post.thumbnails_pending = False
+        if post.image:
+            source = ImageFile(post.image)
+            keys.append([
+                _store_key(source, geometry, options)
+                for geometry, options in settings.POST_THUMBNAILS
+            ])
+        else:
+            keys.append([])
+    values = _get_many({key for post_keys in keys for key in post_keys})
+    ready = [all(key in values for key in post_keys) for post_keys in keys]
+    broken = cache.get_many([
+        _broken_key(post.image.name)
+        for post, is_ready in zip(posts, ready) if not is_ready
+    ])
+    for post, post_keys, is_ready in zip(posts, keys, ready):
+        if not is_ready:
+            if _broken_key(post.image.name) not in broken:
+                # Воркер не успел или картинка старая
+                post.thumbnails_pending = True
+                _requeue(post)
+            continue
+        post.thumbnails = [
+            deserialize_image_file(values[key]) for key in post_keys
+        ]
+        if not all(thumbnail.size for thumbnail in post.thumbnails):
+            # Исходник битый или пропал - картинку не показываем.
+            post.thumbnails = []
+        if post.thumbnails:
+            post.thumbnail = post.thumbnails[-1]
+    return posts
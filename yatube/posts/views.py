@@ -1,30 +1,106 @@
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db.models import OuterRef, Subquery
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.utils.cache import add_never_cache_headers
 
+from . import (
+    exports, search, subscriptions, suggestions, thumbnails, timeline
+)
+from .caching import (
+    cache_versioned, conditional, newest_pub_date, stamp_versions
+)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from yatube.settings import POSTS_PER_PAGE
+from .models import Comment, Follow, Group, Post, User
+from .paginators import CursorPaginator
+from yatube.settings import COMMENTS_PER_PAGE, POSTS_PER_PAGE
 
 
 def paginate(request, objects):
-    paginator = Paginator(objects, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if 'cursor' in request.GET:
+        paginator = CursorPaginator(objects, POSTS_PER_PAGE)
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+    else:
+        paginator = Paginator(objects, POSTS_PER_PAGE)
+        page_number = request.GET.get('page')
+        page_obj = paginator.get_page(page_number)
+    thumbnails.hydrate(page_obj)
+    stamp_versions(page_obj)
     return page_obj
 
 
-@cache_page(20, key_prefix='index_page')
+def render_posts(request, template_name, context, posts):
+    """Страницу, где миниатюры ещё режутся, не кэшируем нигде."""
+    response = render(request, template_name, context)
+    if thumbnails.pending(posts or ()):
+        add_never_cache_headers(response)
+    return response
+
+
+def paginate_comments(post, cursor):
+    comments = post.comments.select_related('author')
+    paginator = CursorPaginator(
+        comments, COMMENTS_PER_PAGE, descending=False
+    )
+    return paginator.get_page(cursor)
+
+
+def _post_scopes(post_id):
+    username = Post.objects.filter(pk=post_id).values_list(
+        'author__username', flat=True
+    ).first()
+    return f'post:{post_id}', f'author:{username}', 'groups'
+
+
+def _post_updated(post_id):
+    """Комментарии тоже обновляют страницу поста."""
+    last_comment = Comment.objects.filter(
+        post=OuterRef('pk')
+    ).order_by('-pub_date').values('pub_date')[:1]
+    dates = Post.objects.filter(pk=post_id).annotate(
+        last_comment=Subquery(last_comment)
+    ).values_list('pub_date', 'last_comment').first()
+    return max(date for date in dates if date) if dates else None
+
+
+def _index_scopes():
+    return 'posts', 'groups'
+
+
+def _group_scopes(slug):
+    return (f'group:{slug}',)
+
+
+def _profile_scopes(username):
+    return f'author:{username}', 'groups'
+
+
+# Правки не двигают pub_date, поэтому их ловит только ETag из версий;
+# браузеры присылают If-None-Match, и он важнее If-Modified-Since.
+@conditional(
+    _index_scopes,
+    lambda: newest_pub_date(Post.objects.all()),
+    per_user=True
+)
+@cache_versioned(_index_scopes)
 def index(request):
     post_list = Post.objects.select_related('group', 'author')
     page_obj = paginate(request, post_list)
     context = {
         'page_obj': page_obj,
     }
-    return render(request, 'posts/index.html', context)
+    return render_posts(
+        request, 'posts/index.html', context, page_obj
+    )
 
 
+@conditional(
+    _group_scopes,
+    lambda slug: newest_pub_date(Post.objects.filter(group__slug=slug)),
+    per_user=True
+)
+@cache_versioned(_group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     post_list = group.posts.select_related('author')
@@ -33,11 +109,21 @@ def group_posts(request, slug):
         'group': group,
         'page_obj': page_obj,
     }
-    return render(request, 'posts/group_list.html', context)
+    return render_posts(
+        request, 'posts/group_list.html', context, page_obj
+    )
 
 
+@conditional(
+    _profile_scopes,
+    lambda username: newest_pub_date(
+        Post.objects.filter(author__username=username)
+    ),
+    per_user=True
+)
+@cache_versioned(_profile_scopes)
 def profile(request, username):
-    author = User.objects.get(username=username)
+    author = User.objects.select_related('stats').get(username=username)
     posts = author.posts.select_related('group')
     page_obj = paginate(request, posts)
     following = request.user.is_authenticated and Follow.objects.filter(
@@ -49,20 +135,78 @@ def profile(request, username):
         'page_obj': page_obj,
         'following': following
     }
-    return render(request, 'posts/profile.html', context)
+    return render_posts(
+        request, 'posts/profile.html', context, page_obj
+    )
+
 
+@login_required
+def profile_export(request, username):
+    if request.user.username != username:
+        return redirect('posts:profile', username)
+    if request.GET.get('format') == 'ndjson':
+        response = StreamingHttpResponse(
+            exports.ndjson(request.user),
+            content_type='application/x-ndjson; charset=utf-8'
+        )
+        extension = 'ndjson'
+    else:
+        response = StreamingHttpResponse(
+            exports.zip_archive(request.user), content_type='application/zip'
+        )
+        extension = 'zip'
+    response['Content-Disposition'] = (
+        f'attachment; filename="yatube-{request.user.pk}.{extension}"'
+    )
+    return response
 
+
+@conditional(_post_scopes, _post_updated, per_user=True)
+@cache_versioned(_post_scopes)
 def post_detail(request, post_id):
     post = get_object_or_404(
-        Post.objects.select_related('author'),
+        Post.objects.select_related('author__stats', 'group'),
         pk=post_id
     )
+    thumbnails.hydrate([post])
     context = {
         'post': post,
         'form': CommentForm(),
-        'comments': post.comments.all()
+        'comments': paginate_comments(post, request.GET.get('comments'))
+    }
+    return render_posts(
+        request, 'posts/post_detail.html', context, [post]
+    )
+
+
+@cache_versioned(lambda post_id: (f'post:{post_id}',))
+def post_comments(request, post_id):
+    post = get_object_or_404(Post, pk=post_id)
+    context = {
+        'post': post,
+        'comments': paginate_comments(post, request.GET.get('cursor')),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        paginator = CursorPaginator(
+            search.SearchResults(query), POSTS_PER_PAGE,
+            keys=search.RANK_KEYS, descending=False, parse_key=float
+        )
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+        thumbnails.hydrate(page_obj)
+        stamp_versions(page_obj)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
     }
-    return render(request, 'posts/post_detail.html', context)
+    return render_posts(
+        request, 'posts/search.html', context, page_obj
+    )
 
 
 @login_required
@@ -76,6 +220,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.pregenerate(post)
         return redirect('posts:profile', request.user.username)
     return render(request, 'posts/create_post.html', {'form': form})
 
@@ -99,6 +244,8 @@ def post_edit(request, post_id):
 
     if form.is_valid():
         post = form.save()
+        if 'image' in form.changed_data:
+            thumbnails.pregenerate(post)
         return redirect('posts:post_detail', post.id)
 
     return render(request, 'posts/create_post.html', context)
@@ -119,28 +266,36 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.select_related('author').filter(
-        author__following__user=request.user
-    )
-    authors = User.objects.all()
+    feed = timeline.Feed(request.user)
+    page_obj = paginate(request, feed)
     context = {
-        'page_obj': paginate(request, post_list),
-        'authors': authors
+        'page_obj': page_obj,
+        'authors': (
+            suggestions.suggested_authors(request.user)
+            if not page_obj else ()
+        ),
     }
-    return render(request, 'posts/follow.html', context)
+    timeline.record_path(feed.path)
+    response = render(request, 'posts/follow.html', context)
+    response['X-Feed-Path'] = feed.path
+    return response
+
+
+def _follow_response(request, username, following):
+    if request.is_ajax():
+        return JsonResponse({'following': following})
+    return redirect('posts:profile', username)
 
 
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    user = request.user
-    if user != author and not author.following.filter(user=user):
-        Follow.objects.create(user=user, author=author)
-    return redirect('posts:profile', username)
+    following = subscriptions.follow(request.user, author)
+    return _follow_response(request, username, following)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author__username=author).delete()
-    return redirect('posts:profile', username)
+    following = subscriptions.unfollow(request.user, author)
+    return _follow_response(request, username, following)
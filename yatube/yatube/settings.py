@@ -1,4 +1,5 @@
 import os
+import sys
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -108,14 +109,56 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+FEED_ITEMS = 20
+API_MAX_LIMIT = 100
+SUGGESTED_AUTHORS_LIMIT = 20
+# У кого подписчиков больше, тех посты не раскладываем по лентам,
+# а подмешиваем при чтении
+TIMELINE_FANOUT_MAX_FOLLOWERS = 1000
+# Миниатюры поста для srcset: несколько ширин с пропорциями 960x339
+# в каждом формате. Последний формат понимают все браузеры, его самая
+# широкая миниатюра идёт в src у <img>.
+POST_THUMBNAIL_WIDTHS = (320, 640, 960)
+POST_THUMBNAIL_FORMATS = ('WEBP', 'JPEG')
+POST_THUMBNAILS = tuple(
+    (f'{width}x{width * 339 // 960}',
+     {'crop': 'center', 'upscale': True, 'format': image_format})
+    for image_format in POST_THUMBNAIL_FORMATS
+    for width in POST_THUMBNAIL_WIDTHS
+)
+# Ограничения на картинку поста; оригиналы больше POST_IMAGE_MAX_SIDE
+# по большей стороне уменьшаем при загрузке
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40_000_000
+POST_IMAGE_MAX_SIDE = 2048
+# Процессы для фоновых задач: нарезка миниатюр, досыпка лент.
+# 0 - выполнять в том же процессе
+BACKGROUND_WORKERS = 2
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Страницы сбрасываются сигналами, так что держать их можно долго
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Кэш в файлах общий для всех воркеров на сервере: версия, поднятая
+# сигналом в одном процессе, видна остальным
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
     }
 }
+# Тесты не должны видеть файлы живого сайта и прошлых прогонов
+if sys.argv[1:2] == ['test'] or 'pytest' in sys.modules:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
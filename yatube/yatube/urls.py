@@ -6,6 +6,7 @@ from django.urls import include, path
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
     path('posts/<slug:slug>/', include('posts.urls', namespace='posts')),
+    path('api/v1/', include('posts.api', namespace='api')),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),